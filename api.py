@@ -1,5 +1,6 @@
-from flask import Flask, make_response, jsonify, request
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask import Flask, Response, g, make_response, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 from flask_jwt_extended.exceptions import (
     NoAuthorizationError,
     InvalidHeaderError,
@@ -11,12 +12,183 @@ from flask_jwt_extended.exceptions import (
     UserClaimsVerificationError
 )
 from flask_mysqldb import MySQL
+from MySQLdb.cursors import Cursor, SSCursor, SSDictCursor
 from flask_bcrypt import Bcrypt
 from dotenv import load_dotenv
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, date, timezone
 from functools import wraps
-from marshmallow import Schema, fields, validate, ValidationError
+from marshmallow import Schema, fields, validate, post_load, ValidationError
+from urllib.parse import urlencode
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from array import array
+import base64
+import click
+import hashlib
+import heapq
+import json
+import math
 import os
+import re
+import MySQLdb
+import threading
+import time
+
+
+##########################
+### DB CONNECTION POOL ###
+##########################
+class PoolTimeoutError(MySQLdb.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    # fixed set of reusable connections plus a bounded number of overflow
+    # connections that are closed again once returned
+    def __init__(self, creator, size=5, max_overflow=10, timeout=30, recycle=3600, pre_ping=True):
+        self.creator = creator
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self.lock = threading.Condition()
+        self.idle = deque()
+        self.total = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+
+    def connect(self):
+        return self.creator(), time.monotonic()
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def checkout(self):
+        started = time.monotonic()
+
+        with self.lock:
+            while True:
+                if self.idle:
+                    conn, created = self.idle.pop()
+                    break
+
+                if self.total < self.size + self.max_overflow:
+                    self.total += 1
+                    conn = None
+                    break
+
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(
+                        f"timed out after {self.timeout}s waiting for a database connection")
+
+                self.lock.wait(remaining)
+
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_time += time.monotonic() - started
+
+        try:
+            if conn is not None and time.monotonic() - created > self.recycle:
+                self.discard(conn)
+                conn = None
+
+            if conn is not None and self.pre_ping:
+                try:
+                    conn.ping()
+                except MySQLdb.Error:
+                    self.discard(conn)
+                    conn = None
+
+            if conn is None:
+                conn, created = self.connect()
+
+        except Exception:
+            with self.lock:
+                self.total -= 1
+                self.in_use -= 1
+                self.lock.notify()
+            raise
+
+        return conn, created
+
+    def checkin(self, conn, created):
+        # never hand an open transaction to the next request
+        try:
+            conn.rollback()
+            healthy = True
+        except MySQLdb.Error:
+            healthy = False
+
+        with self.lock:
+            self.in_use -= 1
+
+            if healthy and len(self.idle) < self.size:
+                self.idle.append((conn, created))
+            else:
+                self.total -= 1
+                self.discard(conn)
+
+            self.lock.notify()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "in_use": self.in_use,
+                "idle": len(self.idle),
+                "total": self.total,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_time_total_seconds": round(self.wait_time, 6),
+                "wait_time_avg_seconds": round(self.wait_time / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+class PooledMySQL(MySQL):
+    # same interface as flask_mysqldb.MySQL, but mysql.connection is checked
+    # out of a shared pool for the app context and returned on teardown
+    # instead of being opened and closed every time
+    def init_app(self, app):
+        super().init_app(app)
+        self.pool = ConnectionPool(
+            creator=lambda: MySQL.connect.fget(self),
+            size=app.config["MYSQL_POOL_SIZE"],
+            max_overflow=app.config["MYSQL_POOL_MAX_OVERFLOW"],
+            timeout=app.config["MYSQL_POOL_TIMEOUT"],
+            recycle=app.config["MYSQL_POOL_RECYCLE"],
+            pre_ping=app.config["MYSQL_POOL_PRE_PING"],
+        )
+
+    @property
+    def connection(self):
+        if "mysql_db" not in g:
+            g.mysql_db, g.mysql_db_created = self.pool.checkout()
+        return g.mysql_db
+
+    def teardown(self, exception):
+        if "mysql_db" in g:
+            self.pool.checkin(g.pop("mysql_db"), g.pop("mysql_db_created"))
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
 
 load_dotenv(verbose=True, override=True)
 
@@ -28,47 +200,1178 @@ app.config["MYSQL_PASSWORD"] = os.getenv("PASSWORD")
 app.config["MYSQL_DB"] = os.getenv("DATABASE")
 app.config["MYSQL_PORT"] = int(os.getenv("PORT"))
 app.config["MYSQL_CURSORCLASS"] = "DictCursor"
-mysql = MySQL(app)
+app.config["MYSQL_POOL_SIZE"] = int(os.getenv("MYSQL_POOL_SIZE", 5))
+app.config["MYSQL_POOL_MAX_OVERFLOW"] = int(os.getenv("MYSQL_POOL_MAX_OVERFLOW", 10))
+app.config["MYSQL_POOL_TIMEOUT"] = float(os.getenv("MYSQL_POOL_TIMEOUT", 30))
+app.config["MYSQL_POOL_RECYCLE"] = int(os.getenv("MYSQL_POOL_RECYCLE", 3600))
+app.config["MYSQL_POOL_PRE_PING"] = os.getenv("MYSQL_POOL_PRE_PING", "true").lower() == "true"
+mysql = PooledMySQL(app)
 
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=24)
+app.config["DISABLE_BLACKLIST_CHECK"] = False
+app.config["REVOKED_TOKEN_REFRESH_SECONDS"] = int(
+    os.getenv("REVOKED_TOKEN_REFRESH_SECONDS", 30))
+app.config["REVOKED_TOKEN_CACHE_SIZE"] = int(
+    os.getenv("REVOKED_TOKEN_CACHE_SIZE", 100000))
+app.config["TOKEN_BLACKLIST_PRUNE_BATCH_SIZE"] = int(
+    os.getenv("TOKEN_BLACKLIST_PRUNE_BATCH_SIZE", 1000))
 jwt = JWTManager(app)
 
+app.config["BCRYPT_LOG_ROUNDS"] = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
 bcrypt = Bcrypt(app)
+app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+app.config["PASSWORD_HASH_QUEUE_DEPTH"] = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", 16))
+app.config["PASSWORD_HASH_TIMEOUT"] = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+app.config["PASSWORD_HASH_RETRY_AFTER"] = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+
+app.config["JSON_PROVIDER"] = os.getenv("JSON_PROVIDER", "orjson")
+app.config["PAGE_SIZE_DEFAULT"] = int(os.getenv("PAGE_SIZE_DEFAULT", 100))
+app.config["PAGE_SIZE_MAX"] = int(os.getenv("PAGE_SIZE_MAX", 1000))
+app.config["STREAM_BATCH_SIZE"] = int(os.getenv("STREAM_BATCH_SIZE", 500))
+app.config["COMPACT_ROWS"] = os.getenv("COMPACT_ROWS", "true").lower() == "true"
+app.config["RESPONSE_CACHE_ENABLED"] = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+app.config["RESPONSE_CACHE_BACKEND"] = os.getenv("RESPONSE_CACHE_BACKEND", "local")
+app.config["RESPONSE_CACHE_REDIS_URL"] = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+app.config["RESPONSE_CACHE_SIZE"] = int(os.getenv("RESPONSE_CACHE_SIZE", 1024))
+app.config["RESPONSE_CACHE_TTL"] = int(os.getenv("RESPONSE_CACHE_TTL", 60))
+app.config["BULK_MAX_ROWS"] = int(os.getenv("BULK_MAX_ROWS", 5000))
+app.config["BULK_CHUNK_SIZE"] = int(os.getenv("BULK_CHUNK_SIZE", 500))
+app.config["STATEMENT_CACHE_SIZE"] = int(os.getenv("STATEMENT_CACHE_SIZE", 256))
+app.config["PEDIGREE_DEPTH_DEFAULT"] = int(os.getenv("PEDIGREE_DEPTH_DEFAULT", 5))
+app.config["PEDIGREE_DEPTH_MAX"] = int(os.getenv("PEDIGREE_DEPTH_MAX", 10))
+app.config["DESCENDANTS_MAX_ROWS"] = int(os.getenv("DESCENDANTS_MAX_ROWS", 5000))
+app.config["COI_GENERATIONS_DEFAULT"] = int(os.getenv("COI_GENERATIONS_DEFAULT", 10))
+app.config["COI_GENERATIONS_MAX"] = int(os.getenv("COI_GENERATIONS_MAX", 20))
+app.config["MATE_SUGGESTIONS_LIMIT_DEFAULT"] = int(os.getenv("MATE_SUGGESTIONS_LIMIT_DEFAULT", 10))
+app.config["MATE_SUGGESTIONS_LIMIT_MAX"] = int(os.getenv("MATE_SUGGESTIONS_LIMIT_MAX", 100))
+app.config["PEDIGREE_INDEX_ENABLED"] = os.getenv("PEDIGREE_INDEX_ENABLED", "true").lower() == "true"
+app.config["PEDIGREE_INDEX_CHECK_SECONDS"] = int(os.getenv("PEDIGREE_INDEX_CHECK_SECONDS", 5))
+app.config["HEALTH_SUMMARY_ENABLED"] = os.getenv("HEALTH_SUMMARY_ENABLED", "true").lower() == "true"
+
+
+#####################
+### JSON PROVIDER ###
+#####################
+class OrjsonProvider(DefaultJSONProvider):
+    # rows are encoded straight to UTF-8 bytes by orjson, which handles
+    # date/datetime natively (ISO 8601); anything else still goes through
+    # Flask's default hook
+    def options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.options()).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self.options(indent))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+if app.config["JSON_PROVIDER"] == "orjson" and orjson is not None:
+    app.json = OrjsonProvider(app)
 
 
 ###################
 ### DB FUNCTION ###
 ###################
-def data_fetch(query, params=None):
-    try:
-        cur = mysql.connection.cursor()
+def db_execute(cur, query, params=None):
+    # every statement sent to MySQL goes through here so the number of
+    # round trips a request costs can be read back from g.db_round_trips
+    g.db_round_trips = g.get("db_round_trips", 0) + 1
+    cur.execute(query, params)
 
-        if params:
-            cur.execute(query, params)
 
-        else:
-            cur.execute(query)
+def data_fetch(query, params=None):
+    # taken outside the try: a pool timeout has no cursor to close and must
+    # reach the caller as the MySQLdb error it is
+    cur = mysql.connection.cursor()
+    try:
+        db_execute(cur, query, params or None)
 
         data = cur.fetchall()
         return data
 
-    except mysql.connection.Error as e:
+    except MySQLdb.Error as e:
         raise
 
     finally:
         cur.close()
 
 
+def data_fetch_rows(query, params=None):
+    # plain tuples from a tuple cursor plus the column names, read once from
+    # cursor.description, instead of a fresh dict with its own keys per row
+    cur = mysql.connection.cursor(Cursor)
+    try:
+        db_execute(cur, query, params or None)
+        columns = tuple(column[0] for column in cur.description)
+        return columns, cur.fetchall()
+
+    finally:
+        cur.close()
+
+
+def rows_response(columns, rows):
+    # each row only becomes a dict for the moment it is encoded. Compact
+    # output is the row encodings joined into one array, byte for byte what
+    # jsonify() gives for the same rows as dicts
+    if columns is None:
+        return jsonify(rows)
+
+    provider = app.json
+    if (provider.compact is None and app.debug) or provider.compact is False:
+        return jsonify([dict(zip(columns, row)) for row in rows])
+
+    body = ",".join(
+        provider.dumps(dict(zip(columns, row)), separators=(",", ":")) for row in rows)
+    return app.response_class(f"[{body}]\n", mimetype=provider.mimetype)
+
+
+##################
+### PAGINATION ###
+##################
+def encode_cursor(payload):
+    payload = json.dumps(payload).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        payload["id"] = int(payload["id"])
+
+        # a cursor for a sorted page must carry the sort value to seek from
+        if payload.get("sort", "id") != "id" and not isinstance(
+                payload.get("value"), (str, int, float)):
+            raise ValueError
+
+        if not isinstance(payload.get("desc", False), bool):
+            raise ValueError
+
+        return payload
+
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("invalid pagination cursor")
+
+
+def get_page_args(args, paginate=True):
+    after = args.get("after")
+    after = decode_cursor(after) if after else None
+
+    if not paginate:
+        return None, after
+
+    limit = args.get("limit", app.config["PAGE_SIZE_DEFAULT"])
+
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+
+    if limit < 1 or limit > app.config["PAGE_SIZE_MAX"]:
+        raise ValueError(
+            f"limit must be between 1 and {app.config['PAGE_SIZE_MAX']}")
+
+    return limit, after
+
+
+def build_page_query(query, key, limit, after, conditions=(), params=(), sort=None):
+    # seek on (sort column, primary key) so every page costs the same
+    # no matter how deep the client pages
+    name, column, descending = sort or ("id", key, False)
+    conditions = list(conditions)
+    params = list(params)
+    op = "<" if descending else ">"
+
+    if after is not None:
+        if after.get("sort", "id") != name or after.get("desc", False) != descending:
+            raise ValueError("cursor does not match the requested sort")
+
+        if column == key:
+            conditions.append(f"{key} {op} %s")
+            params.append(after["id"])
+        else:
+            conditions.append(
+                f"({column} {op} %s OR ({column} = %s AND {key} {op} %s))")
+            params.extend([after["value"], after["value"], after["id"]])
+
+    if conditions:
+        query = f"{query} WHERE {' AND '.join(conditions)}"
+
+    direction = " DESC" if descending else ""
+    if column == key:
+        query = f"{query} ORDER BY {key}{direction}"
+    else:
+        query = f"{query} ORDER BY {column}{direction}, {key}{direction}"
+
+    if limit is not None:
+        query = f"{query} LIMIT %s"
+        params.append(limit + 1)
+
+    return query, tuple(params)
+
+
+def page_cursor(row, key, sort=None):
+    payload = {"id": row[key.split(".")[-1]]}
+
+    if sort is not None and sort[2]:
+        payload["desc"] = True
+
+    if sort is not None and sort[0] != "id":
+        value = row[sort[0]]
+        payload["sort"] = sort[0]
+        payload["value"] = value.isoformat() if hasattr(value, "isoformat") else value
+
+    return encode_cursor(payload)
+
+
+def next_page_link(cursor):
+    args = request.args.to_dict()
+    args["after"] = cursor
+    return f"{request.base_url}?{urlencode(args)}"
+
+
+###########################
+### FILTERS AND SORTING ###
+###########################
+# query string arguments that are never treated as filters
+RESERVED_ARGS = ("limit", "after", "stream", "sort", "fields", "group_by")
+
+FILTER_OPERATORS = {"gte": ">=", "lte": "<=", "gt": ">", "lt": "<"}
+
+
+def parse_filter_value(value, kind):
+    if kind is date:
+        return date.fromisoformat(value)
+    return kind(value)
+
+
+def filter_field(name, filters):
+    # the filtered field and its SQL operator for a query argument
+    field, op = name, "="
+    base, _, suffix = name.rpartition("_")
+    if suffix in FILTER_OPERATORS and base in filters:
+        field, op = base, FILTER_OPERATORS[suffix]
+
+    if field not in filters:
+        raise ValueError(f"unknown filter '{name}'")
+
+    return field, op
+
+
+def get_filters(args, filters):
+    # filters maps a query argument to (column, type); only whitelisted,
+    # indexed columns are exposed so every filter can use an index
+    conditions = []
+    params = []
+
+    for name, value in args.items(multi=True):
+        if name in RESERVED_ARGS:
+            continue
+
+        field, op = filter_field(name, filters)
+
+        column, kind = filters[field]
+        if op != "=" and kind is str:
+            raise ValueError(f"range filters are not supported on '{field}'")
+
+        try:
+            params.append(parse_filter_value(value, kind))
+        except ValueError:
+            raise ValueError(f"invalid value for '{name}'")
+
+        conditions.append(f"{column} {op} %s")
+
+    return conditions, params
+
+
+def index_plans(indexes):
+    # what each index can serve without sorting: equality filters on every
+    # column in id order, or equality on the leading columns sorted by the
+    # last one (InnoDB keeps the primary key as the final index column)
+    plans = [((), "id")]
+
+    for index in indexes:
+        plans.append((index, "id"))
+        plans.append((index[:-1], index[-1]))
+
+    return plans
+
+
+def check_index_path(args, view, filters, sort, indexes):
+    # a filter/sort combination is accepted only when one index returns its
+    # rows already in order, so no request sorts every matching row.
+    # indexes lists the table's indexes by filter/sort name. Filters on
+    # joined tables are checked row by row during the walk, which is only
+    # bounded when at least one equality filter picks the rows
+    equal, ranged, joined = set(), set(), set()
+
+    for name in args:
+        if name in RESERVED_ARGS:
+            continue
+
+        field, op = filter_field(name, filters)
+        table, _, _ = filters[field][0].rpartition(".")
+
+        if table and table != view.table:
+            joined.add(field)
+        elif op == "=":
+            equal.add(field)
+        else:
+            ranged.add(field)
+
+    # a sort field pinned by an equality filter orders like the primary key
+    name = "id" if sort[0] in equal else sort[0]
+
+    for columns, order in index_plans(indexes):
+        if (set(columns) == equal and order == name and ranged <= {order} - {"id"}
+                and (equal or not joined)):
+            return
+
+    supported = "; ".join(
+        f"{' + '.join(columns) or 'no filter'} sorted by {order}"
+        for columns, order in index_plans(indexes))
+    raise ValueError(
+        f"this combination of filters and sort cannot use an index, supported: {supported}")
+
+
+def get_sort(args, key, sorts):
+    # sorts maps a field to a column that leads an index, so ordering by
+    # (column, primary key) is an index scan rather than a filesort
+    sort = args.get("sort", "id")
+    descending = sort.startswith("-")
+    name = sort[1:] if descending else sort
+
+    if name == "id":
+        return name, key, descending
+
+    if name not in sorts:
+        allowed = ", ".join(["id", *sorts])
+        raise ValueError(f"cannot sort by '{name}', sortable fields are: {allowed}")
+
+    return name, sorts[name], descending
+
+
+########################
+### SPARSE FIELDSETS ###
+########################
+class EntityView:
+    # what a read endpoint selects: columns maps each output field to its
+    # SQL expression and joins maps a table alias to its JOIN clause, listed
+    # after any join it depends on. A join is only emitted when a selected
+    # column, filter, sort or another emitted join refers to its alias; all
+    # of them follow NOT NULL foreign keys, so leaving one out never changes
+    # which rows come back
+    def __init__(self, table, columns, joins=None):
+        self.table = table
+        self.columns = columns
+        self.joins = joins or {}
+
+    def refers_to(self, sql, alias):
+        return re.search(rf"\b{alias}\.", sql) is not None
+
+    def required_joins(self, sql):
+        needed = {
+            alias for alias in self.joins
+            if any(self.refers_to(part, alias) for part in sql)
+        }
+
+        for alias in reversed(list(self.joins)):
+            if alias in needed:
+                needed.update(
+                    other for other in self.joins
+                    if other != alias and self.refers_to(self.joins[alias], other)
+                )
+
+        return [self.joins[alias] for alias in self.joins if alias in needed]
+
+    def select(self, fields=None, sql=()):
+        expressions = []
+        for name in fields or self.columns:
+            expression = self.columns[name]
+            if expression == name or expression.endswith(f".{name}"):
+                expressions.append(expression)
+            else:
+                expressions.append(f"{expression} AS {name}")
+
+        joins = self.required_joins([*expressions, *sql])
+        return " ".join([f"SELECT {', '.join(expressions)} FROM {self.table}", *joins])
+
+
+def get_fields(args, view, always=()):
+    # ?fields=id,name,breed narrows the SELECT list; fields the endpoint
+    # needs for itself (primary key, sort column) are always included
+    value = args.get("fields")
+    if not value:
+        return None
+
+    fields = [name.strip() for name in value.split(",") if name.strip()]
+
+    for name in fields:
+        if name not in view.columns:
+            allowed = ", ".join(view.columns)
+            raise ValueError(f"unknown field '{name}', selectable fields are: {allowed}")
+
+    for name in always:
+        if name not in fields:
+            fields.append(name)
+
+    return fields
+
+
+#################
+### STREAMING ###
+#################
+def wants_stream():
+    if request.args.get("stream") in ("1", "true"):
+        return True
+
+    best = request.accept_mimetypes.best_match(
+        ["application/json", "application/x-ndjson"])
+    return best == "application/x-ndjson"
+
+
+def stream_entities(query, params=None):
+    # unbuffered server-side cursor: rows are pulled from MySQL in
+    # batches while the response is being written
+    compact = app.config["COMPACT_ROWS"]
+    cur = mysql.connection.cursor(SSCursor if compact else SSDictCursor)
+    db_execute(cur, query, params or None)
+    columns = tuple(column[0] for column in cur.description) if compact else None
+
+    def generate():
+        try:
+            while True:
+                rows = cur.fetchmany(app.config["STREAM_BATCH_SIZE"])
+
+                if not rows:
+                    break
+
+                if columns is not None:
+                    rows = (dict(zip(columns, row)) for row in rows)
+
+                yield "".join(f"{app.json.dumps(row)}\n" for row in rows)
+
+        finally:
+            cur.close()
+
+    return Response(stream_with_context(generate()), 200, mimetype="application/x-ndjson")
+
+
+######################
+### RESPONSE CACHE ###
+######################
+class LocalCacheBackend:
+    # per-process LRU with a TTL on every entry. Its write times only cover
+    # this process's writes, so they cannot back Last-Modified
+    shared = False
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.versions = {}
+            self.modified = {}
+            self.started = time.time()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def get_versions(self, tables):
+        with self.lock:
+            return [self.versions.get(table, 0) for table in tables]
+
+    def get_last_modified(self, tables):
+        with self.lock:
+            return [self.modified.get(table, self.started) for table in tables]
+
+    def bump_version(self, table):
+        with self.lock:
+            self.versions[table] = self.versions.get(table, 0) + 1
+            self.modified[table] = time.time()
+
+
+class RedisCacheBackend:
+    # shared between workers; size is bounded by the server's maxmemory
+    # policy (use allkeys-lru)
+    shared = True
+
+    def __init__(self, url, prefix="caninecanaan:"):
+        if redis is None:
+            raise RuntimeError(
+                "RESPONSE_CACHE_BACKEND=redis requires the redis package")
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.client.set(f"{self.prefix}started", time.time(), nx=True)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+    def get(self, key):
+        value = self.client.get(f"{self.prefix}response:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(f"{self.prefix}response:{key}", json.dumps(value), ex=ttl)
+
+    def get_versions(self, tables):
+        values = self.client.mget([f"{self.prefix}version:{table}" for table in tables])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def get_last_modified(self, tables):
+        keys = [f"{self.prefix}modified:{table}" for table in tables]
+        *values, started = self.client.mget([*keys, f"{self.prefix}started"])
+        return [float(value if value is not None else started or 0) for value in values]
+
+    def bump_version(self, table):
+        pipe = self.client.pipeline()
+        pipe.incr(f"{self.prefix}version:{table}")
+        pipe.set(f"{self.prefix}modified:{table}", time.time())
+        pipe.execute()
+
+
+class ResponseCache:
+    # every cached view lists the tables it reads and their current
+    # versions are part of its key, so bumping a table's version on write
+    # invalidates the table's own views and every joined view at once
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, tables):
+        versions = self.backend.get_versions(tables)
+        args = urlencode(sorted(request.args.items(multi=True)))
+        role = get_jwt().get("role")
+        stamp = ",".join(f"{table}:{version}" for table, version in zip(tables, versions))
+        return f"{request.path}?{args}|{role}|{stamp}"
+
+    def get(self, key):
+        value = self.backend.get(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, key, response):
+        self.backend.set(
+            key,
+            {
+                "body": response.get_data(as_text=True),
+                "mimetype": response.mimetype,
+                "headers": {
+                    name: response.headers[name]
+                    for name in ("Link", "X-Next-Cursor", "ETag", "Last-Modified")
+                    if name in response.headers
+                },
+            },
+            app.config["RESPONSE_CACHE_TTL"],
+        )
+
+    def invalidate(self, table):
+        self.backend.bump_version(table)
+
+    def last_modified(self, tables):
+        # None unless every worker's writes are seen, i.e. the backend is
+        # shared. HTTP dates have whole seconds, so the write time is rounded
+        # up and left out while that second is still running: a later write
+        # then always gets a later date. Tables not written since the backend
+        # started count as modified at that moment
+        if not self.backend.shared:
+            return None
+
+        modified = math.ceil(max(self.backend.get_last_modified(tables)))
+        if modified > time.time():
+            return None
+
+        return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def create_cache_backend():
+    if app.config["RESPONSE_CACHE_BACKEND"] == "redis":
+        return RedisCacheBackend(app.config["RESPONSE_CACHE_REDIS_URL"])
+    return LocalCacheBackend(app.config["RESPONSE_CACHE_SIZE"])
+
+
+response_cache = ResponseCache(create_cache_backend())
+
+
+# must sit below role_required, the key includes the caller's role.
+# Also answers conditional GETs: If-None-Match against a strong ETag of
+# the body and, when the backend can vouch for it, If-Modified-Since
+# against the tables' last write
+def cache_response(*tables):
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            if wants_stream():
+                return fn(*args, **kwargs)
+
+            caching = app.config["RESPONSE_CACHE_ENABLED"]
+
+            if caching:
+                key = response_cache.key(tables)
+                cached = response_cache.get(key)
+
+                if cached is not None:
+                    response = make_response(cached["body"], 200)
+                    response.mimetype = cached["mimetype"]
+                    response.headers.update(cached["headers"])
+                    response.headers["X-Cache"] = "HIT"
+                    return response.make_conditional(request)
+
+            response = fn(*args, **kwargs)
+
+            if response.status_code != 200:
+                return response
+
+            response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+            last_modified = response_cache.last_modified(tables)
+            if last_modified is not None:
+                response.last_modified = last_modified
+
+            if caching:
+                response_cache.set(key, response)
+                response.headers["X-Cache"] = "MISS"
+
+            return response.make_conditional(request)
+        return decorator
+    return wrapper
+
+
+######################
+### SCHEMA RECORDS ###
+######################
+class Record:
+    # what the write helpers get back from a schema: one slot per field and
+    # no per-instance __dict__. Fields a partial load left out stay unset,
+    # so keys() is exactly the fields that were sent, in schema order
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def keys(self):
+        return [name for name in self.__slots__ if hasattr(self, name)]
+
+    def values(self):
+        return [getattr(self, name) for name in self.keys()]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.keys()]
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __len__(self):
+        return len(self.keys())
+
+
+class RecordSchema(Schema):
+    # building a Schema copies every declared field, so each schema keeps
+    # one full and one partial instance and reuses them for every request
+    record_class = Record
+
+    @classmethod
+    def cached(cls, partial=False):
+        attr = "_partial_instance" if partial else "_instance"
+        schema = cls.__dict__.get(attr)
+
+        if schema is None:
+            schema = cls(partial=partial)
+            setattr(cls, attr, schema)
+
+        return schema
+
+    @post_load
+    def make_record(self, data, **kwargs):
+        return self.record_class(**data)
+
+
+#######################
+### STATEMENT CACHE ###
+#######################
+def build_insert(entity, fields):
+    placeholders = ", ".join(["%s"] * len(fields))
+    return f"INSERT INTO {entity} ({', '.join(fields)}) VALUES ({placeholders})"
+
+
+def build_update(entity, fields):
+    assignments = ", ".join(f"{field} = %s" for field in fields)
+    return f"UPDATE {entity} SET {assignments} WHERE id = %s"
+
+
+STATEMENT_BUILDERS = {"insert": build_insert, "update": build_update}
+
+
+class StatementCache:
+    # SQL text of the single-row INSERT/UPDATE statements, keyed by
+    # (statement, entity, set of fields) and bounded as an LRU. The field
+    # order is stored with the text so params line up however the fields
+    # arrived. MySQLdb has no server-side prepared statements, so reusing
+    # the text is as far as this goes
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, kind, entity, fields):
+        key = (kind, entity, frozenset(fields))
+
+        with self.lock:
+            statement = self.statements.get(key)
+
+            if statement is not None:
+                self.hits += 1
+                self.statements.move_to_end(key)
+                return statement
+
+            self.misses += 1
+
+        fields = tuple(fields)
+        statement = (STATEMENT_BUILDERS[kind](entity, fields), fields)
+
+        with self.lock:
+            self.statements[key] = statement
+
+            while len(self.statements) > self.size:
+                self.statements.popitem(last=False)
+                self.evictions += 1
+
+        return statement
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "statements": len(self.statements),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+statement_cache = StatementCache(app.config["STATEMENT_CACHE_SIZE"])
+
+
+######################
+### PEDIGREE INDEX ###
+######################
+def grow(values, size, fill):
+    if len(values) < size:
+        values.extend(array("q", [fill]) * (size - len(values)))
+
+
+class PedigreeLinks:
+    # read access to the dog -> litter -> sire/dam arrays
+    def __init__(self, dog_litter, litter_sire, litter_dam):
+        self.dog_litter = dog_litter
+        self.litter_sire = litter_sire
+        self.litter_dam = litter_dam
+
+    def __contains__(self, id):
+        return 0 < id < len(self.dog_litter) and self.dog_litter[id] >= 0
+
+    def parents(self, id):
+        litter = self.dog_litter[id]
+
+        if litter <= 0 or litter >= len(self.litter_sire) or self.litter_sire[litter] < 0:
+            return 0, 0
+
+        return self.litter_sire[litter], self.litter_dam[litter]
+
+
+class PedigreeIndex(PedigreeLinks):
+    # process-local copy of the dog -> litter -> sire/dam links as integer
+    # arrays indexed by id (ids are auto-increment, so the arrays are dense):
+    # dog_litter[dog id] is the litter id (0 for none, -1 for no such dog),
+    # litter_sire/litter_dam[litter id] the parents (-1 for no such litter).
+    #
+    # Every dog/litter write bumps pedigree_version inside its transaction.
+    # When the bump lands exactly one past our version the change is applied
+    # in place; otherwise another worker wrote in between and the index is
+    # rebuilt. Readers compare against pedigree_version at most every
+    # PEDIGREE_INDEX_CHECK_SECONDS, so no worker serves a stale tree longer
+    # than that
+    ENTITIES = ("dog", "litter")
+    LINK_FIELDS = ("litter_id", "sire_id", "dam_id")
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.dog_litter = array("q")
+        self.litter_sire = array("q")
+        self.litter_dam = array("q")
+        self.version = None
+        self.stale = False
+        self.checked_at = None
+        self.rebuilds = 0
+        self.applied = 0
+
+    def snapshot(self):
+        # a copy of the arrays, so long computations run without the lock
+        # while writes keep being applied
+        with self.lock:
+            return PedigreeLinks(
+                array("q", self.dog_litter), array("q", self.litter_sire),
+                array("q", self.litter_dam))
+
+    def read_version(self):
+        rows = data_fetch("SELECT version FROM pedigree_version WHERE id = 1")
+        return rows[0]["version"] if rows else 0
+
+    def rebuild(self):
+        # read in one transaction, so the version matches the rows
+        version = self.read_version()
+        _, dogs = data_fetch_rows("SELECT id, litter_id FROM dog")
+        _, litters = data_fetch_rows("SELECT id, sire_id, dam_id FROM litter")
+
+        dog_litter = array("q")
+        grow(dog_litter, max((id for id, _ in dogs), default=0) + 1, -1)
+        for id, litter_id in dogs:
+            dog_litter[id] = litter_id or 0
+
+        litter_sire = array("q")
+        litter_dam = array("q")
+        size = max((id for id, _, _ in litters), default=0) + 1
+        grow(litter_sire, size, -1)
+        grow(litter_dam, size, -1)
+        for id, sire_id, dam_id in litters:
+            litter_sire[id] = sire_id
+            litter_dam[id] = dam_id
+
+        self.dog_litter = dog_litter
+        self.litter_sire = litter_sire
+        self.litter_dam = litter_dam
+        self.version = version
+        self.stale = False
+        self.rebuilds += 1
+
+    def ensure_fresh(self):
+        # with the response cache on, this only runs on a cache miss, which
+        # may come from a write another worker just made: the version is then
+        # always read, so the new cache key never stores a stale tree
+        now = time.monotonic()
+        force = app.config["RESPONSE_CACHE_ENABLED"]
+
+        with self.lock:
+            if (not force and self.version is not None and not self.stale
+                    and now - self.checked_at < app.config["PEDIGREE_INDEX_CHECK_SECONDS"]):
+                return
+
+            if self.version is None or self.stale or self.read_version() != self.version:
+                self.rebuild()
+
+            self.checked_at = now
+
+    def begin_write(self, cur, entity, fields=None):
+        # call inside the write transaction, before the change itself; the
+        # row lock also orders concurrent dog/litter writers. fields is None
+        # for inserts and deletes; updates that leave the parent links alone
+        # (a new name, breed or birthplace) neither bump nor queue on the row
+        if entity not in self.ENTITIES or not app.config["PEDIGREE_INDEX_ENABLED"]:
+            return None
+
+        if fields is not None and not any(field in self.LINK_FIELDS for field in fields):
+            return None
+
+        db_execute(
+            cur, "UPDATE pedigree_version SET version = LAST_INSERT_ID(version + 1) WHERE id = 1")
+        return cur.lastrowid
+
+    def commit_write(self, version, entity, kind, changes):
+        # changes are (id, record) pairs, record is None for deletes
+        if version is None:
+            return
+
+        with self.lock:
+            if self.version is None:
+                return
+
+            if version != self.version + 1:
+                self.stale = True
+                return
+
+            for id, info in changes:
+                self.apply(entity, kind, id, dict(info.items()) if info is not None else None)
+
+            self.version = version
+            self.applied += 1
+
+    def apply(self, entity, kind, id, info):
+        if entity == "dog":
+            if kind == "insert":
+                grow(self.dog_litter, id + 1, -1)
+                self.dog_litter[id] = info.get("litter_id") or 0
+            elif id in self:
+                if kind == "delete":
+                    self.dog_litter[id] = -1
+                elif "litter_id" in info:
+                    self.dog_litter[id] = info["litter_id"] or 0
+            return
+
+        if kind == "insert":
+            grow(self.litter_sire, id + 1, -1)
+            grow(self.litter_dam, id + 1, -1)
+            self.litter_sire[id] = info["sire_id"]
+            self.litter_dam[id] = info["dam_id"]
+        elif id < len(self.litter_sire) and self.litter_sire[id] >= 0:
+            if kind == "delete":
+                self.litter_sire[id] = -1
+                self.litter_dam[id] = -1
+            else:
+                self.litter_sire[id] = info.get("sire_id", self.litter_sire[id])
+                self.litter_dam[id] = info.get("dam_id", self.litter_dam[id])
+
+    def ancestors(self, ids, depth):
+        # {dog id: (sire id, dam id)} for ids and their ancestors up to depth
+        # generations, walked breadth first so every dog is visited once
+        links = {}
+        level = [id for id in ids if id in self]
+
+        for generation in range(depth + 1):
+            upper = []
+
+            for id in level:
+                if id in links:
+                    continue
+
+                links[id] = self.parents(id)
+                upper.extend(parent for parent in links[id] if parent and parent in self)
+
+            level = upper
+
+        return links
+
+    def stats(self):
+        with self.lock:
+            return {
+                "version": self.version,
+                "dogs": sum(1 for litter in self.dog_litter if litter >= 0),
+                "litters": sum(1 for sire in self.litter_sire if sire >= 0),
+                "stale": self.stale,
+                "rebuilds": self.rebuilds,
+                "applied_writes": self.applied,
+            }
+
+
+pedigree_index = PedigreeIndex()
+
+
+########################
+### HEALTH SUMMARIES ###
+########################
+class HealthSummaries:
+    # health_problem rows counted per group and month in summary tables, so
+    # analytics reads touch one row per group instead of every problem.
+    # Write helpers call subtract before changing health_problem,
+    # health_record or dog rows and add after, in the same transaction:
+    # subtract takes back what the touched rows counted for, add counts them
+    # again as they are now. INSERT ... SELECT share-locks the rows it
+    # reads, so no other writer can change them in between
+    MONTH = "DATE_SUB(hp.date, INTERVAL DAY(hp.date) - 1 DAY)"
+    SOURCE = """FROM health_problem hp
+        JOIN health_record hr ON hr.id = hp.health_record_id
+        JOIN dog d ON d.id = hr.dog_id"""
+
+    # summary -> (table, {column: expression over SOURCE})
+    TABLES = {
+        "breeds": ("health_problem_by_breed", {"breed": "d.breed", "problem": "hp.problem", "month": MONTH}),
+        "vets": ("health_problem_by_vet", {"vet_id": "hr.vet_id", "problem": "hp.problem", "month": MONTH}),
+    }
+
+    # entity -> (expression picking its health_problem rows,
+    #            {field: summaries in which changing it moves rows between groups})
+    SCOPES = {
+        "health_problem": ("hp.id", {
+            "health_record_id": ("breeds", "vets"),
+            "problem": ("breeds", "vets"),
+            "date": ("breeds", "vets"),
+        }),
+        "health_record": ("hp.health_record_id", {"dog_id": ("breeds",), "vet_id": ("vets",)}),
+        "dog": ("hr.dog_id", {"breed": ("breeds",)}),
+    }
+
+    def touched(self, entity, fields=None):
+        # fields is None for inserts and deletes, which only move counts for
+        # health_problem rows: new records and dogs have no problems yet and
+        # the foreign keys refuse to delete ones that still have some
+        if not app.config["HEALTH_SUMMARY_ENABLED"] or entity not in self.SCOPES:
+            return []
+
+        if fields is None:
+            return list(self.TABLES) if entity == "health_problem" else []
+
+        moves = self.SCOPES[entity][1]
+        return [name for name in self.TABLES
+                if any(name in moves.get(field, ()) for field in fields)]
+
+    def upsert(self, name, where=""):
+        table, keys = self.TABLES[name]
+        expressions = ", ".join(keys.values())
+
+        return f"""INSERT INTO {table} ({', '.join(keys)}, problems)
+            SELECT {expressions}, %s * COUNT(*) {self.SOURCE} {where}
+            GROUP BY {expressions}
+            ON DUPLICATE KEY UPDATE problems = problems + VALUES(problems)"""
+
+    def adjust(self, cur, entity, ids, fields, sign):
+        names = self.touched(entity, fields)
+        scope = self.SCOPES[entity][0] if names else None
+
+        for chunk in chunked(list(ids) if names else [], app.config["BULK_CHUNK_SIZE"]):
+            for name in names:
+                db_execute(
+                    cur,
+                    self.upsert(name, f"WHERE {scope} IN ({placeholders_for(chunk)})"),
+                    (sign, *chunk),
+                )
+
+    def subtract(self, cur, entity, ids, fields=None):
+        self.adjust(cur, entity, ids, fields, -1)
+
+    def add(self, cur, entity, ids, fields=None):
+        self.adjust(cur, entity, ids, fields, 1)
+
+    def rebuild(self, cur):
+        for name, (table, _) in self.TABLES.items():
+            db_execute(cur, f"DELETE FROM {table}")
+            db_execute(cur, self.upsert(name), (1,))
+
+    def columns(self, name):
+        # the summary columns, or the expressions behind them when the
+        # summaries are switched off and reads aggregate health_problem
+        _, keys = self.TABLES[name]
+
+        if app.config["HEALTH_SUMMARY_ENABLED"]:
+            return {column: column for column in keys}
+
+        return keys
+
+    def read(self, name, group_by, conditions=(), params=()):
+        table, _ = self.TABLES[name]
+        columns = self.columns(name)
+        selected = ", ".join(f"{columns[column]} AS {column}" for column in group_by)
+        grouped = ", ".join(columns[column] for column in group_by)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        if app.config["HEALTH_SUMMARY_ENABLED"]:
+            source, total = f"FROM {table}", "CAST(SUM(problems) AS SIGNED)"
+        else:
+            source, total = self.SOURCE, "COUNT(*)"
+
+        return data_fetch(
+            f"""SELECT {selected}, {total} AS problems {source} {where}
+                GROUP BY {grouped} HAVING problems > 0 ORDER BY {grouped}""",
+            tuple(params),
+        )
+
+
+health_summaries = HealthSummaries()
+
+
 ##############################
 ### GENERIC CRUD FUNCTIONS ###
 ##############################
-def get_entities(query):
+def get_entities(view, key="id", filters=None, sorts=None, indexes=()):
     try:
-        data = data_fetch(query=query)
-        return make_response(jsonify(data), 200)
+        stream = wants_stream()
+        limit, after = get_page_args(request.args, paginate=not stream)
+        conditions, params = get_filters(request.args, filters or {})
+        sort = get_sort(request.args, key, sorts or {})
+        check_index_path(request.args, view, filters or {}, sort, indexes)
+        fields = get_fields(request.args, view, always=("id", sort[0]))
+        query = view.select(fields, [*conditions, sort[1]])
+        page_query, params = build_page_query(
+            query, key, limit, after, conditions, params, sort)
+
+        if stream:
+            return stream_entities(page_query, params)
+
+        if app.config["COMPACT_ROWS"]:
+            columns, data = data_fetch_rows(query=page_query, params=params)
+        else:
+            columns, data = None, list(data_fetch(query=page_query, params=params))
+
+        response = make_response(rows_response(columns, data[:limit]), 200)
+
+        if len(data) > limit:
+            last = data[limit - 1]
+            if columns is not None:
+                last = dict(zip(columns, last))
+
+            cursor = page_cursor(last, key, sort)
+            response.headers["Link"] = f'<{next_page_link(cursor)}>; rel="next"'
+            response.headers["X-Next-Cursor"] = cursor
+
+        return response
+
+    except ValueError as ve:
+        return make_response(
+            jsonify(
+                {
+                    "message": "invalid query parameters",
+                    "error": str(ve),
+                }
+            ),
+            400,
+        )
 
-    except mysql.connection.Error as e:
+    except MySQLdb.Error as e:
         return make_response(
             jsonify(
                 {
@@ -91,12 +1394,27 @@ def get_entities(query):
         )
 
 
-def get_entity(query, id):
+def get_entity(view, id, key="id"):
     try:
-        data = data_fetch(query=query, params=(id,))
-        return make_response(jsonify(data), 200)
+        fields = get_fields(request.args, view, always=("id",))
+        query = f"{view.select(fields)} WHERE {key} = %s"
+
+        if app.config["COMPACT_ROWS"]:
+            columns, data = data_fetch_rows(query=query, params=(id,))
+        else:
+            columns, data = None, data_fetch(query=query, params=(id,))
+
+        return make_response(rows_response(columns, data), 200)
+
+    except ValueError as ve:
+        return make_response(
+            jsonify(
+                {"message": "invalid query parameters", "error": str(ve)}
+            ),
+            400
+        )
 
-    except mysql.connection.Error as e:
+    except MySQLdb.Error as e:
         return make_response(
             jsonify(
                 {"message": "database error occurred", "error": str(e)}
@@ -115,18 +1433,19 @@ def get_entity(query, id):
 
 def add_entity(request, entity, schema_class):
     try:
-        schema = schema_class()
+        schema = schema_class.cached()
         info = schema.load(request.get_json())
 
-        fields = list(info.keys())
-        placeholders = ", ".join(["%s"] * len(fields))
-        columns = ", ".join(fields)
-        query = f"INSERT INTO {entity} ({columns}) VALUES ({placeholders})"
+        query, fields = statement_cache.get("insert", entity, info.keys())
 
         cur = mysql.connection.cursor()
-        cur.execute(query, [info[field] for field in fields])
+        version = pedigree_index.begin_write(cur, entity)
+        db_execute(cur, query, [info[field] for field in fields])
+        id, rows_affected = cur.lastrowid, cur.rowcount
+        health_summaries.add(cur, entity, [id])
         mysql.connection.commit()
-        rows_affected = cur.rowcount
+        response_cache.invalidate(entity)
+        pedigree_index.commit_write(version, entity, "insert", [(id, info)])
         cur.close()
 
         return make_response(
@@ -144,7 +1463,7 @@ def add_entity(request, entity, schema_class):
             jsonify({"message": "validation error", "errors": ve.messages}), 400
         )
 
-    except mysql.connection.Error as e:
+    except MySQLdb.Error as e:
         return make_response(
             jsonify({"message": "a database error occurred", "error": str(e)}), 500
         )
@@ -158,7 +1477,7 @@ def add_entity(request, entity, schema_class):
 
 def update_entity(request, entity, schema_class, id):
     try:
-        schema = schema_class(partial=True)
+        schema = schema_class.cached(partial=True)
         info = schema.load(request.get_json())
 
         if not info:
@@ -167,16 +1486,19 @@ def update_entity(request, entity, schema_class, id):
                     {"message": "At least one valid field must be provided to update"}), 400
             )
 
-        fields = [f"{field} = %s" for field in info.keys()]
-        params = list(info.values())
+        query, fields = statement_cache.get("update", entity, info.keys())
+        params = [info[field] for field in fields]
         params.append(id)
 
-        query = f"UPDATE {entity} SET {', '.join(fields)} WHERE id = %s"
-
         cur = mysql.connection.cursor()
-        cur.execute(query, tuple(params))
-        mysql.connection.commit()
+        version = pedigree_index.begin_write(cur, entity, info.keys())
+        health_summaries.subtract(cur, entity, [id], info.keys())
+        db_execute(cur, query, tuple(params))
         rows_affected = cur.rowcount
+        health_summaries.add(cur, entity, [id], info.keys())
+        mysql.connection.commit()
+        response_cache.invalidate(entity)
+        pedigree_index.commit_write(version, entity, "update", [(id, info)])
         cur.close()
 
         if rows_affected == 0:
@@ -201,7 +1523,7 @@ def update_entity(request, entity, schema_class, id):
             jsonify({"message": "Validation error", "errors": ve.messages}), 400
         )
 
-    except mysql.connection.Error as e:
+    except MySQLdb.Error as e:
         return make_response(
             jsonify({"message": "A database error occurred", "error": str(e)}), 500
         )
@@ -216,9 +1538,13 @@ def update_entity(request, entity, schema_class, id):
 def delete_entity(entity, id):
     try:
         cur = mysql.connection.cursor()
-        cur.execute(f"""DELETE FROM {entity} WHERE id = %s""", (id,))
-        mysql.connection.commit()
+        version = pedigree_index.begin_write(cur, entity)
+        health_summaries.subtract(cur, entity, [id])
+        db_execute(cur, f"""DELETE FROM {entity} WHERE id = %s""", (id,))
         rows_affected = cur.rowcount
+        mysql.connection.commit()
+        response_cache.invalidate(entity)
+        pedigree_index.commit_write(version, entity, "delete", [(id, None)])
         cur.close()
 
         if rows_affected == 0:
@@ -235,7 +1561,7 @@ def delete_entity(entity, id):
             200,
         )
 
-    except mysql.connection.Error as e:
+    except MySQLdb.Error as e:
         return make_response(
             jsonify(
                 {"message": "database error occurred",
@@ -252,52 +1578,584 @@ def delete_entity(entity, id):
         )
 
 
-######################
-### ERROR HANDLERS ###
-#####################
-@app.errorhandler(Exception)
-def handle_exception(e):
-    return make_response(jsonify({"message": "an unexpected error occurred.", "error": str(e)}), 500)
+########################
+### PASSWORD HASHING ###
+########################
+class PasswordHasherBusy(Exception):
+    pass
 
 
-@app.errorhandler(NoAuthorizationError)
-def handle_no_authorization_error(e):
-    return make_response(jsonify({"message": "authorization token is missing. Please include it in the header.", "error": str(e)}), 401)
+def hash_password_worker(password, rounds):
+    return bcrypt.generate_password_hash(password, rounds).decode("utf-8")
 
 
-@app.errorhandler(InvalidHeaderError)
-def handle_invalid_header_error(e):
-    return make_response(jsonify({"message": "invalid authorization header format. Ensure it's in the form 'Bearer <token>'.", "error": str(e)}), 401)
+def check_password_worker(pw_hash, password):
+    return bcrypt.check_password_hash(pw_hash, password)
 
 
-@app.errorhandler(JWTDecodeError)
-def handle_jwt_decode_error(e):
-    return make_response(jsonify({"message": "error decoding token. The token may be malformed.", "error": str(e)}), 401)
+# upper bounds (seconds) of the verification time histogram
+VERIFY_TIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float("inf"))
 
 
-@app.errorhandler(RevokedTokenError)
-def handle_revoked_token_error(e):
-    return make_response(jsonify({"message": "token has been revoked. Please log in again.", "error": str(e)}), 401)
+def hash_rounds(pw_hash):
+    # bcrypt hashes look like $2b$12$<salt+digest>
+    try:
+        return int(pw_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
 
 
-@app.errorhandler(WrongTokenError)
-def handle_wrong_token_error(e):
-    return make_response(jsonify({"message": "wrong token type used. Ensure you're using the correct token type.", "error": str(e)}), 401)
+def rehash_password(email, old_hash, password):
+    with app.app_context():
+        try:
+            new_hash = password_hasher.hash(password)
 
+            cur = mysql.connection.cursor()
+            db_execute(
+                cur,
+                "UPDATE user SET password = %s WHERE email = %s AND password = %s",
+                (new_hash, email, old_hash),
+            )
+            mysql.connection.commit()
+            cur.close()
+
+        except Exception:
+            # the old hash keeps working, the next login will try again
+            pass
+
+
+def schedule_rehash(email, old_hash, password):
+    threading.Thread(
+        target=rehash_password,
+        args=(email, old_hash, password),
+        daemon=True,
+    ).start()
+
+
+class PasswordHasher:
+    # bcrypt runs in a separate process pool so a burst of logins cannot
+    # hold the request workers; once queue_depth calls are in flight new
+    # ones are turned away instead of queueing without bound
+    def __init__(self, workers, queue_depth, timeout):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.executor = None
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.verify_times = {}
+
+    def get_executor(self):
+        # created on first use so each forked server worker gets its own
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def release(self, future=None):
+        with self.lock:
+            self.in_flight -= 1
+
+    def run(self, fn, *args):
+        with self.lock:
+            if self.in_flight >= self.queue_depth:
+                self.rejected += 1
+                raise PasswordHasherBusy(
+                    f"{self.in_flight} password operations already in flight")
+            self.in_flight += 1
+
+        if self.workers == 0:
+            try:
+                return fn(*args)
+            finally:
+                self.release()
+
+        try:
+            with self.lock:
+                executor = self.get_executor()
+
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self.release()
+            raise
+
+        # the slot is held until the call itself is done, not until the
+        # caller stops waiting: cancel() cannot stop a call that is already
+        # running, so a timed out call still counts against queue_depth
+        future.add_done_callback(self.release)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy(
+                f"password operation took longer than {self.timeout}s")
+
+    def hash(self, password):
+        return self.run(hash_password_worker, password, app.config["BCRYPT_LOG_ROUNDS"])
+
+    def check(self, pw_hash, password):
+        started = time.monotonic()
+        result = self.run(check_password_worker, pw_hash, password)
+        self.observe(hash_rounds(pw_hash), time.monotonic() - started)
+        return result
+
+    def observe(self, rounds, elapsed):
+        with self.lock:
+            histogram = self.verify_times.setdefault(rounds, {
+                "count": 0,
+                "sum_seconds": 0.0,
+                "buckets": dict.fromkeys(VERIFY_TIME_BUCKETS, 0),
+            })
+            histogram["count"] += 1
+            histogram["sum_seconds"] += elapsed
+
+            for bound in VERIFY_TIME_BUCKETS:
+                if elapsed <= bound:
+                    histogram["buckets"][bound] += 1
+                    break
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "verify_seconds_by_rounds": {
+                    str(rounds): {
+                        "count": histogram["count"],
+                        "sum_seconds": round(histogram["sum_seconds"], 6),
+                        "buckets": {
+                            str(bound): count for bound, count in histogram["buckets"].items()
+                        },
+                    }
+                    for rounds, histogram in self.verify_times.items()
+                },
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=app.config["PASSWORD_HASH_WORKERS"],
+    queue_depth=app.config["PASSWORD_HASH_QUEUE_DEPTH"],
+    timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+)
 
-@app.errorhandler(FreshTokenRequired)
-def handle_fresh_token_required_error(e):
-    return make_response(jsonify({"message": "fresh token is required to access this resource.", "error": str(e)}), 401)
 
+###########################
+### BULK CRUD FUNCTIONS ###
+###########################
+def get_bulk_rows(request):
+    rows = request.get_json()
 
-@app.errorhandler(UserLookupError)
-def handle_user_lookup_error(e):
-    return make_response(jsonify({"message": "user not found. Please verify your credentials.", "error": str(e)}), 404)
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("a non-empty list of entries is required")
 
+    if len(rows) > app.config["BULK_MAX_ROWS"]:
+        raise ValueError(
+            f"at most {app.config['BULK_MAX_ROWS']} entries can be sent at once")
 
-@app.errorhandler(UserClaimsVerificationError)
-def handle_user_claims_error(e):
-    return make_response(jsonify({"message": "user claims verification failed. Please contact support.", "error": str(e)}), 401)
+    return rows
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def add_entities(request, entity, schema_class):
+    try:
+        rows = get_bulk_rows(request)
+        schema = schema_class.cached()
+
+        # one pass: every entry is validated and loaded together
+        errors = {}
+        shapes = {}
+        for index, row in enumerate(rows):
+            try:
+                info = schema.load(row)
+            except ValidationError as ve:
+                errors[index] = ve.messages
+                continue
+
+            # rows that left out optional fields need their own INSERT shape
+            shapes.setdefault(tuple(info.keys()), []).append((index, info))
+
+        if not shapes:
+            return make_response(
+                jsonify({"message": "validation error", "errors": errors}), 400
+            )
+
+        inserted_ids = [None] * len(rows)
+        rows_affected = 0
+
+        cur = mysql.connection.cursor()
+        try:
+            version = pedigree_index.begin_write(cur, entity)
+
+            for shape, entries in shapes.items():
+                query, fields = statement_cache.get("insert", entity, shape)
+
+                for chunk in chunked(entries, app.config["BULK_CHUNK_SIZE"]):
+                    # one explicit multi-row INSERT per chunk: executemany()
+                    # splits the rows into several statements past
+                    # max_stmt_length, and lastrowid then only belongs to
+                    # the last of them
+                    db_execute(
+                        cur,
+                        build_multi_insert(query, fields, len(chunk)),
+                        [info[field] for _, info in chunk for field in fields],
+                    )
+
+                    if cur.rowcount != len(chunk):
+                        raise MySQLdb.DatabaseError(
+                            f"expected {len(chunk)} inserted rows, got {cur.rowcount}")
+                    rows_affected += cur.rowcount
+
+                    # a single INSERT gets consecutive auto-increment ids
+                    # starting at lastrowid; this assumes the server runs
+                    # with auto_increment_increment = 1 (the default)
+                    ids = [cur.lastrowid + offset for offset in range(len(chunk))]
+                    for id, (index, _) in zip(ids, chunk):
+                        inserted_ids[index] = id
+
+                    health_summaries.add(cur, entity, ids)
+
+            mysql.connection.commit()
+            response_cache.invalidate(entity)
+            pedigree_index.commit_write(version, entity, "insert", [
+                (inserted_ids[index], info)
+                for entries in shapes.values() for index, info in entries
+            ])
+
+        except MySQLdb.Error:
+            mysql.connection.rollback()
+            raise
+
+        finally:
+            cur.close()
+
+        return make_response(
+            jsonify(
+                {
+                    "message": f"{rows_affected} {' '.join(str(entity).split('_'))} entries added successfully",
+                    "rows_affected": rows_affected,
+                    "inserted_ids": inserted_ids,
+                    "errors": errors,
+                }
+            ),
+            207 if errors else 201,
+        )
+
+    except ValueError as ve:
+        return make_response(
+            jsonify({"message": "invalid bulk request", "error": str(ve)}), 400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify({"message": "a database error occurred", "error": str(e)}), 500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "an unexpected error occurred",
+                    "error": str(e)}), 500
+        )
+
+
+def placeholders_for(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def build_multi_insert(query, fields, count):
+    # the cached single-row INSERT with its VALUES list repeated count times
+    head, _, _ = query.rpartition(" VALUES ")
+    row = f"({placeholders_for(fields)})"
+    return f"{head} VALUES {', '.join([row] * count)}"
+
+
+def find_existing_ids(cur, entity, ids):
+    existing = set()
+
+    # lock the rows so they cannot vanish before the write in this transaction
+    for chunk in chunked(ids, app.config["BULK_CHUNK_SIZE"]):
+        db_execute(
+            cur,
+            f"SELECT id FROM {entity} WHERE id IN ({placeholders_for(chunk)}) FOR UPDATE",
+            tuple(chunk),
+        )
+        existing.update(row["id"] for row in cur.fetchall())
+
+    return existing
+
+
+def is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def get_bulk_ids(rows):
+    errors = {}
+    ids = {}
+
+    for index, id in enumerate(rows):
+        if not is_id(id):
+            errors[index] = ["id must be an integer"]
+        elif id in ids:
+            errors[index] = [f"duplicate id {id}"]
+        else:
+            ids[id] = index
+
+    return list(ids), errors
+
+
+def update_entities(request, entity, schema_class):
+    try:
+        rows = get_bulk_rows(request)
+        schema = schema_class.cached(partial=True)
+
+        errors = {}
+        updates = {}
+
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors[index] = ["entry must be an object with id and fields"]
+                continue
+
+            id = row.get("id")
+            if not is_id(id):
+                errors[index] = {"id": ["id must be an integer"]}
+                continue
+            if id in updates:
+                errors[index] = {"id": [f"duplicate id {id}"]}
+                continue
+
+            try:
+                info = schema.load(row.get("fields") or {})
+            except ValidationError as ve:
+                errors[index] = {"fields": ve.messages}
+                continue
+
+            if not info:
+                errors[index] = {"fields": ["At least one valid field must be provided to update"]}
+                continue
+
+            updates[id] = info
+
+        if not updates:
+            return make_response(
+                jsonify({"message": "validation error", "errors": errors}), 400
+            )
+
+        rows_affected = 0
+
+        cur = mysql.connection.cursor()
+        try:
+            version = pedigree_index.begin_write(
+                cur, entity, {field for info in updates.values() for field in info.keys()})
+            existing = find_existing_ids(cur, entity, list(updates))
+            missing_ids = [id for id in updates if id not in existing]
+
+            # one UPDATE ... CASE statement per field set and chunk
+            shapes = {}
+            for id, info in updates.items():
+                if id in existing:
+                    shapes.setdefault(tuple(info.keys()), []).append((id, info))
+
+            for fields, entries in shapes.items():
+                for chunk in chunked(entries, app.config["BULK_CHUNK_SIZE"]):
+                    assignments = []
+                    params = []
+
+                    for field in fields:
+                        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                        assignments.append(f"{field} = CASE id {cases} END")
+                        for id, info in chunk:
+                            params.extend((id, info[field]))
+
+                    ids = [id for id, _ in chunk]
+                    params.extend(ids)
+
+                    health_summaries.subtract(cur, entity, ids, fields)
+                    db_execute(
+                        cur,
+                        f"UPDATE {entity} SET {', '.join(assignments)} WHERE id IN ({placeholders_for(ids)})",
+                        tuple(params),
+                    )
+                    rows_affected += cur.rowcount
+                    health_summaries.add(cur, entity, ids, fields)
+
+            mysql.connection.commit()
+            response_cache.invalidate(entity)
+            pedigree_index.commit_write(version, entity, "update", [
+                (id, info) for entries in shapes.values() for id, info in entries
+            ])
+
+        except MySQLdb.Error:
+            mysql.connection.rollback()
+            raise
+
+        finally:
+            cur.close()
+
+        return make_response(
+            jsonify(
+                {
+                    "message": f"{' '.join(str(entity).split('_'))} entries updated successfully",
+                    "rows_affected": rows_affected,
+                    "missing_ids": missing_ids,
+                    "errors": errors,
+                }
+            ),
+            207 if errors or missing_ids else 200,
+        )
+
+    except ValueError as ve:
+        return make_response(
+            jsonify({"message": "invalid bulk request", "error": str(ve)}), 400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify({"message": "A database error occurred", "error": str(e)}), 500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "An unexpected error occurred",
+                    "error": str(e)}), 500
+        )
+
+
+def delete_entities(request, entity):
+    try:
+        ids, errors = get_bulk_ids(get_bulk_rows(request))
+
+        if errors:
+            return make_response(
+                jsonify({"message": "validation error", "errors": errors}), 400
+            )
+
+        rows_affected = 0
+
+        cur = mysql.connection.cursor()
+        try:
+            version = pedigree_index.begin_write(cur, entity)
+            existing = find_existing_ids(cur, entity, ids)
+            missing_ids = [id for id in ids if id not in existing]
+            found = [id for id in ids if id in existing]
+
+            for chunk in chunked(found, app.config["BULK_CHUNK_SIZE"]):
+                health_summaries.subtract(cur, entity, chunk)
+                db_execute(
+                    cur,
+                    f"DELETE FROM {entity} WHERE id IN ({placeholders_for(chunk)})",
+                    tuple(chunk),
+                )
+                rows_affected += cur.rowcount
+
+            mysql.connection.commit()
+            response_cache.invalidate(entity)
+            pedigree_index.commit_write(version, entity, "delete", [(id, None) for id in found])
+
+        except MySQLdb.Error:
+            mysql.connection.rollback()
+            raise
+
+        finally:
+            cur.close()
+
+        return make_response(
+            jsonify(
+                {
+                    "message": f"{' '.join(str(entity).split('_'))} entries deleted successfully",
+                    "rows_affected": rows_affected,
+                    "missing_ids": missing_ids,
+                }
+            ),
+            207 if missing_ids else 200,
+        )
+
+    except ValueError as ve:
+        return make_response(
+            jsonify({"message": "invalid bulk request", "error": str(ve)}), 400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify(
+                {"message": "database error occurred",
+                    "error": str(e)}
+            ),
+            500,
+        )
+    except Exception as e:
+        return make_response(
+            jsonify(
+                {"message": "an unexpected error occurred.", "error": str(e)}
+            ),
+            500,
+        )
+
+
+######################
+### ERROR HANDLERS ###
+#####################
+@app.errorhandler(Exception)
+def handle_exception(e):
+    return make_response(jsonify({"message": "an unexpected error occurred.", "error": str(e)}), 500)
+
+
+@app.errorhandler(NoAuthorizationError)
+def handle_no_authorization_error(e):
+    return make_response(jsonify({"message": "authorization token is missing. Please include it in the header.", "error": str(e)}), 401)
+
+
+@app.errorhandler(InvalidHeaderError)
+def handle_invalid_header_error(e):
+    return make_response(jsonify({"message": "invalid authorization header format. Ensure it's in the form 'Bearer <token>'.", "error": str(e)}), 401)
+
+
+@app.errorhandler(JWTDecodeError)
+def handle_jwt_decode_error(e):
+    return make_response(jsonify({"message": "error decoding token. The token may be malformed.", "error": str(e)}), 401)
+
+
+@app.errorhandler(RevokedTokenError)
+def handle_revoked_token_error(e):
+    return make_response(jsonify({"message": "token has been revoked. Please log in again.", "error": str(e)}), 401)
+
+
+@app.errorhandler(WrongTokenError)
+def handle_wrong_token_error(e):
+    return make_response(jsonify({"message": "wrong token type used. Ensure you're using the correct token type.", "error": str(e)}), 401)
+
+
+@app.errorhandler(FreshTokenRequired)
+def handle_fresh_token_required_error(e):
+    return make_response(jsonify({"message": "fresh token is required to access this resource.", "error": str(e)}), 401)
+
+
+@app.errorhandler(UserLookupError)
+def handle_user_lookup_error(e):
+    return make_response(jsonify({"message": "user not found. Please verify your credentials.", "error": str(e)}), 404)
+
+
+@app.errorhandler(UserClaimsVerificationError)
+def handle_user_claims_error(e):
+    return make_response(jsonify({"message": "user claims verification failed. Please contact support.", "error": str(e)}), 401)
+
+
+@app.errorhandler(PasswordHasherBusy)
+def handle_password_hasher_busy(e):
+    response = make_response(jsonify({"message": "authentication is busy, please retry shortly.", "error": str(e)}), 503)
+    response.headers["Retry-After"] = str(app.config["PASSWORD_HASH_RETRY_AFTER"])
+    return response
+
+
+@app.errorhandler(PoolTimeoutError)
+def handle_pool_timeout_error(e):
+    return make_response(jsonify({"message": "the database is busy, please retry shortly.", "error": str(e)}), 503)
 
 
 @jwt.expired_token_loader
@@ -334,11 +2192,11 @@ def register():
         return make_response(jsonify({"message": "email, password, and role are required"}), 400)
 
     try:
-        hashed_password = bcrypt.generate_password_hash(
-            password).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
 
         cur = mysql.connection.cursor()
-        cur.execute(
+        db_execute(
+            cur,
             """INSERT INTO user (email, password, role) VALUES (%s, %s, %s)""",
             (email, hashed_password, role),
         )
@@ -363,7 +2221,10 @@ def register():
             201,
         )
 
-    except mysql.connection.Error as e:
+    except PasswordHasherBusy:
+        raise
+
+    except MySQLdb.Error as e:
         return make_response(
             jsonify(
                 {
@@ -403,9 +2264,14 @@ def login():
 
         user = result[0]
 
-        if not bcrypt.check_password_hash(user["password"], password):
+        if not password_hasher.check(user["password"], password):
             return make_response(jsonify({"message": "invalid password"}), 401)
 
+        # upgrade (or downgrade) the stored hash to the configured cost
+        # without making this login wait for it
+        if hash_rounds(user["password"]) != app.config["BCRYPT_LOG_ROUNDS"]:
+            schedule_rehash(user["email"], user["password"], password)
+
         access_token = create_access_token(
             identity=user["email"],
             additional_claims={"role": user["role"]},
@@ -413,7 +2279,10 @@ def login():
         )
         return make_response(jsonify({"access_token": access_token}), 200)
 
-    except mysql.connection.Error as e:
+    except PasswordHasherBusy:
+        raise
+
+    except MySQLdb.Error as e:
         return make_response(
             jsonify(
                 {
@@ -440,34 +2309,145 @@ def login():
 @jwt_required()
 def logout():
     try:
-        jti = get_jwt()["jti"]
-        expiration = datetime.now(
-        ) + app.config["JWT_ACCESS_TOKEN_EXPIRES"]
+        claims = get_jwt()
+        jti = claims["jti"]
+        expiration = datetime.fromtimestamp(claims["exp"])
 
         cur = mysql.connection.cursor()
-        cur.execute(
+        db_execute(
+            cur,
             "INSERT INTO token_blacklist (jti, expiration) VALUES (%s, %s)",
             (jti, expiration),
         )
         mysql.connection.commit()
         cur.close()
 
+        revoked_tokens.add(jti, claims["exp"])
+
         return make_response(jsonify({"message": "successfully logged out"}), 200)
     except Exception as e:
         return make_response(jsonify({"message": "An error occurred during logout", "error": str(e)}), 500)
 
 
+class RevokedTokenCache:
+    # process-local copy of token_blacklist: jti -> token exp. Every
+    # refresh reloads the whole live set (one range scan on expiration_idx),
+    # so a logout on another worker takes effect within
+    # REVOKED_TOKEN_REFRESH_SECONDS while every other request is answered
+    # without touching the database. Reading only ids past the last one
+    # seen would miss rows that committed out of id order
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.revoked = {}
+        self.refreshed_at = None
+        self.overflowed = False
+
+    def add(self, jti, exp):
+        with self.lock:
+            if not self.overflowed:
+                self.revoked[jti] = exp
+
+    def refresh(self, now):
+        capacity = app.config["REVOKED_TOKEN_CACHE_SIZE"]
+
+        rows = data_fetch(
+            """SELECT jti, expiration FROM token_blacklist
+                WHERE expiration > %s LIMIT %s""",
+            (datetime.fromtimestamp(now), capacity + 1),
+        )
+
+        # more live revocations than we are allowed to hold: keep none and
+        # try again on the next refresh
+        self.overflowed = len(rows) > capacity
+        self.revoked = {} if self.overflowed else {
+            row["jti"]: row["expiration"].timestamp() for row in rows
+        }
+
+        self.refreshed_at = now
+
+    def is_revoked(self, jti):
+        now = time.time()
+
+        with self.lock:
+            if (self.refreshed_at is None
+                    or now - self.refreshed_at >= app.config["REVOKED_TOKEN_REFRESH_SECONDS"]):
+                self.refresh(now)
+
+            # too many live revocations to hold in memory, let the caller
+            # fall back to an indexed lookup
+            if self.overflowed:
+                return None
+
+            exp = self.revoked.get(jti)
+            return exp is not None and exp > now
+
+
+revoked_tokens = RevokedTokenCache()
+
+
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blacklist(jwt_header, jwt_payload):
+    if app.config["DISABLE_BLACKLIST_CHECK"]:
+        return False
+
+    # fails closed: when the blacklist cannot be read (a pool timeout, the
+    # database being down) the error answers the request instead of letting
+    # a possibly revoked token through
+    jti = jwt_payload["jti"]
+    revoked = revoked_tokens.is_revoked(jti)
+
+    if revoked is not None:
+        return revoked
+
+    cur = mysql.connection.cursor()
     try:
-        jti = jwt_payload["jti"]
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT 1 FROM token_blacklist WHERE jti = %s", (jti,))
-        result = cur.fetchone()
+        db_execute(cur, "SELECT 1 FROM token_blacklist WHERE jti = %s", (jti,))
+        return cur.fetchone() is not None
+    finally:
         cur.close()
-        return result is not None
-    except Exception as e:
-        return False
+
+
+def prune_token_blacklist(batch_size=None):
+    batch_size = batch_size or app.config["TOKEN_BLACKLIST_PRUNE_BATCH_SIZE"]
+    cutoff = datetime.now()
+    started = time.monotonic()
+    rows_removed = 0
+
+    # small batches, each in its own transaction, so the delete never
+    # holds locks on token_blacklist for long
+    cur = mysql.connection.cursor()
+    try:
+        while True:
+            db_execute(
+                cur,
+                """DELETE FROM token_blacklist
+                    WHERE expiration < %s ORDER BY expiration LIMIT %s""",
+                (cutoff, batch_size),
+            )
+            mysql.connection.commit()
+            rows_removed += cur.rowcount
+
+            if cur.rowcount < batch_size:
+                break
+
+    finally:
+        cur.close()
+
+    return {
+        "rows_removed": rows_removed,
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
+
+
+@app.cli.command("prune-token-blacklist")
+@click.option("--batch-size", type=int, default=None, help="Rows deleted per transaction.")
+def prune_token_blacklist_command(batch_size):
+    result = prune_token_blacklist(batch_size)
+    click.echo(
+        f"removed {result['rows_removed']} expired tokens in {result['elapsed_seconds']}s")
 
 
 @app.route("/protected", methods=["GET"])
@@ -479,11 +2459,13 @@ def protected():
     return make_response(jsonify({"logged_in_as": current_user, "role": role}), 200)
 
 
+# verifies the token itself, so routes must not stack @jwt_required() on top:
+# one request means one decode and at most one blacklist lookup
 def role_required(allowed_roles):
     def wrapper(fn):
         @wraps(fn)
-        @jwt_required()
         def decorator(*args, **kwargs):
+            verify_jwt_in_request()
             claims = get_jwt()
             user_role = claims.get("role")
 
@@ -495,10 +2477,36 @@ def role_required(allowed_roles):
     return wrapper
 
 
+#############
+### ADMIN ###
+#############
+@app.route("/admin/stats", methods=["GET"])
+@role_required(["admin"])
+def get_stats():
+    return make_response(
+        jsonify(
+            {
+                "db_pool": mysql.pool.stats(),
+                "password_hasher": password_hasher.stats(),
+                "response_cache": response_cache.stats(),
+                "statement_cache": statement_cache.stats(),
+                "pedigree_index": pedigree_index.stats(),
+            }
+        ),
+        200
+    )
+
+
 ################
 ### DOG CRUD ###
 ################
-class DogSchema(Schema):
+class DogRecord(Record):
+    __slots__ = ("litter_id", "name", "gender", "breed")
+
+
+class DogSchema(RecordSchema):
+    record_class = DogRecord
+
     id = fields.Int(dump_only=True)
     litter_id = fields.Int(allow_none=True)
     name = fields.Str(required=True, validate=validate.Length(min=1))
@@ -509,27 +2517,47 @@ class DogSchema(Schema):
     breed = fields.Str(required=True, validate=validate.Length(min=1))
 
 
+DOG_VIEW = EntityView(
+    table="dog",
+    columns={
+        "id": "id",
+        "litter_id": "litter_id",
+        "name": "name",
+        "gender": "gender",
+        "breed": "breed",
+    }
+)
+
+
 @app.route("/dogs", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("dog")
 def get_dogs():
-    response = get_entities(query="""SELECT * FROM dog""")
+    response = get_entities(
+        view=DOG_VIEW,
+        filters={
+            "breed": ("breed", str),
+            "gender": ("gender", int),
+            "litter_id": ("litter_id", int),
+        },
+        indexes=[
+            ("breed",),  # breed_idx
+            ("breed", "gender"),  # breed_gender_idx
+            ("litter_id",),  # fk_dog_litter1_idx
+        ]
+    )
     return response
 
 
 @app.route("/dogs/<int:id>", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("dog")
 def get_dog(id):
-    response = get_entity(
-        query="""SELECT * FROM dog WHERE id = %s""",
-        id=id
-    )
+    response = get_entity(view=DOG_VIEW, id=id)
     return response
 
 
 @app.route("/dogs", methods=["POST"])
-@jwt_required()
 @role_required(["admin", "breeder"])
 def add_dog():
     response = add_entity(
@@ -540,8 +2568,36 @@ def add_dog():
     return response
 
 
+@app.route("/dogs/bulk", methods=["POST"])
+@role_required(["admin", "breeder"])
+def add_dogs():
+    response = add_entities(
+        request=request,
+        entity="dog",
+        schema_class=DogSchema
+    )
+    return response
+
+
+@app.route("/dogs/bulk", methods=["PUT"])
+@role_required(["admin", "breeder"])
+def update_dogs():
+    response = update_entities(
+        request=request,
+        entity="dog",
+        schema_class=DogSchema
+    )
+    return response
+
+
+@app.route("/dogs/bulk", methods=["DELETE"])
+@role_required(["admin"])
+def delete_dogs():
+    response = delete_entities(request=request, entity="dog")
+    return response
+
+
 @app.route("/dogs/<int:id>", methods=["PUT"])
-@jwt_required()
 @role_required(["admin", "breeder"])
 def update_dog(id):
     response = update_entity(
@@ -554,7 +2610,6 @@ def update_dog(id):
 
 
 @app.route("/dogs/<int:id>", methods=["DELETE"])
-@jwt_required()
 @role_required(["admin"])
 def delete_dog(id):
     response = delete_entity(entity="dog", id=id)
@@ -564,7 +2619,13 @@ def delete_dog(id):
 ################
 ### VET CRUD ###
 ################
-class VetSchema(Schema):
+class VetRecord(Record):
+    __slots__ = ("firstname", "lastname", "email", "phone")
+
+
+class VetSchema(RecordSchema):
+    record_class = VetRecord
+
     id = fields.Int(dump_only=True)
     firstname = fields.Str(
         required=True, validate=validate.Length(min=1, max=45))
@@ -574,27 +2635,35 @@ class VetSchema(Schema):
     phone = fields.Str(allow_none=True, validate=validate.Length(max=45))
 
 
+VET_VIEW = EntityView(
+    table="vet",
+    columns={
+        "id": "id",
+        "firstname": "firstname",
+        "lastname": "lastname",
+        "email": "email",
+        "phone": "phone",
+    }
+)
+
+
 @app.route("/vets", methods=["GET"])
-@jwt_required()
 @role_required(["breeder", "admin"])
+@cache_response("vet")
 def get_vets():
-    response = get_entities(query="""SELECT * FROM vet""")
+    response = get_entities(view=VET_VIEW)
     return response
 
 
 @app.route("/vets/<int:id>", methods=["GET"])
-@jwt_required()
 @role_required(["breeder", "admin"])
+@cache_response("vet")
 def get_vet(id):
-    response = get_entity(
-        query="""SELECT * FROM vet WHERE id = %s""",
-        id=id
-    )
+    response = get_entity(view=VET_VIEW, id=id)
     return response
 
 
 @app.route("/vets", methods=["POST"])
-@jwt_required()
 @role_required(["admin"])
 def add_vet():
     response = add_entity(
@@ -605,8 +2674,36 @@ def add_vet():
     return response
 
 
+@app.route("/vets/bulk", methods=["POST"])
+@role_required(["admin"])
+def add_vets():
+    response = add_entities(
+        request=request,
+        entity="vet",
+        schema_class=VetSchema
+    )
+    return response
+
+
+@app.route("/vets/bulk", methods=["PUT"])
+@role_required(["admin"])
+def update_vets():
+    response = update_entities(
+        request=request,
+        entity="vet",
+        schema_class=VetSchema
+    )
+    return response
+
+
+@app.route("/vets/bulk", methods=["DELETE"])
+@role_required(["admin"])
+def delete_vets():
+    response = delete_entities(request=request, entity="vet")
+    return response
+
+
 @app.route("/vets/<int:id>", methods=["PUT"])
-@jwt_required()
 @role_required(["admin"])
 def update_vet(id):
     response = update_entity(
@@ -619,7 +2716,6 @@ def update_vet(id):
 
 
 @app.route("/vets/<int:id>", methods=["DELETE"])
-@jwt_required()
 @role_required(["admin"])
 def delete_vet(id):
     response = delete_entity(entity="vet", id=id)
@@ -629,54 +2725,72 @@ def delete_vet(id):
 ##########################
 ### HEALTH RECORD CRUD ###
 ##########################
-class HealthRecordSchema(Schema):
+class HealthRecordRecord(Record):
+    __slots__ = ("dog_id", "vet_id")
+
+
+class HealthRecordSchema(RecordSchema):
+    record_class = HealthRecordRecord
+
     id = fields.Int(dump_only=True)
     dog_id = fields.Int(required=True)
     vet_id = fields.Int(required=True)
 
 
+HEALTH_RECORD_VIEW = EntityView(
+    table="health_record",
+    columns={
+        "id": "health_record.id",
+        "vet_id": "health_record.vet_id",
+        "vet": "CONCAT_WS(' ', vet.firstname, vet.lastname)",
+        "dog_id": "health_record.dog_id",
+        "dog": "dog.name",
+        "breed": "dog.breed",
+    },
+    joins={
+        "dog": "JOIN dog ON health_record.dog_id = dog.id",
+        "vet": "JOIN vet ON health_record.vet_id = vet.id",
+    }
+)
+
+
 @app.route("/health_records", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("health_record", "dog", "vet")
 def get_health_records():
     response = get_entities(
-        query="""SELECT
-                    health_record.id,
-                    health_record.vet_id,
-                    CONCAT_WS(' ', vet.firstname, vet.lastname) AS vet,
-                    health_record.dog_id,
-                    dog.name AS dog,
-                    dog.breed
-                FROM health_record
-                JOIN dog ON health_record.dog_id = dog.id
-                JOIN vet ON health_record.vet_id = vet.id"""
+        view=HEALTH_RECORD_VIEW,
+        key="health_record.id",
+        filters={
+            "dog_id": ("health_record.dog_id", int),
+            "vet_id": ("health_record.vet_id", int),
+            "breed": ("dog.breed", str),
+        },
+        sorts={
+            "dog_id": "health_record.dog_id",
+            "vet_id": "health_record.vet_id",
+        },
+        indexes=[
+            ("dog_id",),  # fk_health_record_dog1_idx
+            ("vet_id",),  # fk_health_record_vet1_idx
+        ]
     )
     return response
 
 
 @app.route("/health_records/<int:id>", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("health_record", "dog", "vet")
 def get_health_record(id):
     response = get_entity(
-        query="""SELECT
-                    health_record.id,
-                    health_record.vet_id,
-                    CONCAT_WS(' ', vet.firstname, vet.lastname) AS vet,
-                    health_record.dog_id,
-                    dog.name AS dog,
-                    dog.breed
-                FROM health_record
-                JOIN dog ON health_record.dog_id = dog.id
-                JOIN vet ON health_record.vet_id = vet.id
-                WHERE health_record.id = %s""",
-        id=id
+        view=HEALTH_RECORD_VIEW,
+        id=id,
+        key="health_record.id"
     )
     return response
 
 
 @app.route("/health_records", methods=["POST"])
-@jwt_required()
 @role_required(["breeder", "vet", "admin"])
 def add_health_record():
     response = add_entity(
@@ -687,8 +2801,36 @@ def add_health_record():
     return response
 
 
+@app.route("/health_records/bulk", methods=["POST"])
+@role_required(["breeder", "vet", "admin"])
+def add_health_records():
+    response = add_entities(
+        request=request,
+        entity="health_record",
+        schema_class=HealthRecordSchema
+    )
+    return response
+
+
+@app.route("/health_records/bulk", methods=["PUT"])
+@role_required(["breeder", "vet", "admin"])
+def update_health_records():
+    response = update_entities(
+        request=request,
+        entity="health_record",
+        schema_class=HealthRecordSchema
+    )
+    return response
+
+
+@app.route("/health_records/bulk", methods=["DELETE"])
+@role_required(["admin"])
+def delete_health_records():
+    response = delete_entities(request=request, entity="health_record")
+    return response
+
+
 @app.route("/health_records/<int:id>", methods=["PUT"])
-@jwt_required()
 @role_required(["breeder", "vet", "admin"])
 def update_health_record(id):
     response = update_entity(
@@ -701,7 +2843,6 @@ def update_health_record(id):
 
 
 @app.route("/health_records/<int:id>", methods=["DELETE"])
-@jwt_required()
 @role_required(["admin"])
 def delete_health_record(id):
     response = delete_entity(entity="health_record", id=id)
@@ -711,7 +2852,13 @@ def delete_health_record(id):
 ###################
 ### LITTER CRUD ###
 ###################
-class LitterSchema(Schema):
+class LitterRecord(Record):
+    __slots__ = ("sire_id", "dam_id", "birthdate", "birthplace")
+
+
+class LitterSchema(RecordSchema):
+    record_class = LitterRecord
+
     id = fields.Int(dump_only=True)
     sire_id = fields.Int(required=True)
     dam_id = fields.Int(required=True)
@@ -720,54 +2867,65 @@ class LitterSchema(Schema):
         required=True, validate=validate.Length(min=1, max=135))
 
 
+LITTER_VIEW = EntityView(
+    table="litter",
+    columns={
+        "id": "litter.id",
+        "sire_id": "litter.sire_id",
+        "sire_name": "sire.name",
+        "sire_breed": "sire.breed",
+        "dam_id": "litter.dam_id",
+        "dam_name": "dam.name",
+        "dam_breed": "dam.breed",
+        "birthdate": "litter.birthdate",
+        "birthplace": "litter.birthplace",
+    },
+    joins={
+        "sire": "JOIN dog sire ON sire.id = litter.sire_id",
+        "dam": "JOIN dog dam ON dam.id = litter.dam_id",
+    }
+)
+
+
 @app.route("/litters", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "admin"])
+@cache_response("litter", "dog")
 def get_litters():
     response = get_entities(
-        query="""SELECT
-                    litter.id,
-                    litter.sire_id,
-                    sire.name as sire_name,
-                    sire.breed as sire_breed,
-                    litter.dam_id,
-                    dam.name as dam_name,
-                    dam.breed as dam_breed,
-                    litter.birthdate,
-                    litter.birthplace
-                FROM litter
-                JOIN dog sire ON sire.id = litter.sire_id
-                JOIN dog dam ON dam.id = litter.dam_id"""
+        view=LITTER_VIEW,
+        key="litter.id",
+        filters={
+            "sire_id": ("litter.sire_id", int),
+            "dam_id": ("litter.dam_id", int),
+            "birthdate": ("litter.birthdate", date),
+        },
+        sorts={
+            "birthdate": "litter.birthdate",
+        },
+        indexes=[
+            ("birthdate",),  # birthdate_idx
+            ("dam_id",),  # fk_litter_dog1_idx
+            ("sire_id", "dam_id"),  # sire_dam_idx
+            ("sire_id", "birthdate"),  # sire_birthdate_idx
+            ("dam_id", "birthdate"),  # dam_birthdate_idx
+        ]
     )
     return response
 
 
 @app.route("/litters/<int:id>", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "admin"])
+@cache_response("litter", "dog")
 def get_litter(id):
     response = get_entity(
-        query="""SELECT
-                    litter.id,
-                    litter.sire_id,
-                    sire.name as sire_name,
-                    sire.breed as sire_breed,
-                    litter.dam_id,
-                    dam.name as dam_name,
-                    dam.breed as dam_breed,
-                    litter.birthdate,
-                    litter.birthplace
-                FROM litter
-                JOIN dog sire ON sire.id = litter.sire_id
-                JOIN dog dam ON dam.id = litter.dam_id
-                WHERE litter.id = %s""",
-        id=id
+        view=LITTER_VIEW,
+        id=id,
+        key="litter.id"
     )
     return response
 
 
 @app.route("/litters", methods=["POST"])
-@jwt_required()
 @role_required(["breeder", "admin"])
 def add_litter():
     response = add_entity(
@@ -778,8 +2936,36 @@ def add_litter():
     return response
 
 
+@app.route("/litters/bulk", methods=["POST"])
+@role_required(["breeder", "admin"])
+def add_litters():
+    response = add_entities(
+        request=request,
+        entity="litter",
+        schema_class=LitterSchema
+    )
+    return response
+
+
+@app.route("/litters/bulk", methods=["PUT"])
+@role_required(["breeder", "admin"])
+def update_litters():
+    response = update_entities(
+        request=request,
+        entity="litter",
+        schema_class=LitterSchema
+    )
+    return response
+
+
+@app.route("/litters/bulk", methods=["DELETE"])
+@role_required(["admin"])
+def delete_litters():
+    response = delete_entities(request=request, entity="litter")
+    return response
+
+
 @app.route("/litters/<int:id>", methods=["PUT"])
-@jwt_required()
 @role_required(["breeder", "admin"])
 def update_litter(id):
     response = update_entity(
@@ -792,7 +2978,6 @@ def update_litter(id):
 
 
 @app.route("/litters/<int:id>", methods=["DELETE"])
-@jwt_required()
 @role_required(["admin"])
 def delete_litter(id):
     response = delete_entity(entity="litter", id=id)
@@ -802,7 +2987,13 @@ def delete_litter(id):
 ###########################
 ### HEALTH PROBLEM CRUD ###
 ###########################
-class HealthProblemSchema(Schema):
+class HealthProblemRecord(Record):
+    __slots__ = ("health_record_id", "problem", "date", "treatment")
+
+
+class HealthProblemSchema(RecordSchema):
+    record_class = HealthProblemRecord
+
     id = fields.Int(dump_only=True)
     health_record_id = fields.Int(required=True)
     problem = fields.Str(
@@ -811,57 +3002,69 @@ class HealthProblemSchema(Schema):
     treatment = fields.Str(allow_none=True, validate=validate.Length(max=135))
 
 
+HEALTH_PROBLEM_VIEW = EntityView(
+    table="health_problem",
+    columns={
+        "id": "health_problem.id",
+        "vet_id": "health_record.vet_id",
+        "vet_name": "CONCAT_WS(' ', vet.firstname, vet.lastname)",
+        "dog_id": "health_record.dog_id",
+        "dog_name": "dog.name",
+        "dog_breed": "dog.breed",
+        "health_record_id": "health_problem.health_record_id",
+        "problem": "health_problem.problem",
+        "date": "health_problem.date",
+        "treatment": "health_problem.treatment",
+    },
+    joins={
+        "health_record": "JOIN health_record ON health_record.id = health_problem.health_record_id",
+        "vet": "JOIN vet ON health_record.vet_id = vet.id",
+        "dog": "JOIN dog ON health_record.dog_id = dog.id",
+    }
+)
+
+
 @app.route("/health_problems", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("health_problem", "health_record", "vet", "dog")
 def get_health_problems():
     response = get_entities(
-        query="""SELECT 
-                health_problem.id,
-                vet.id as vet_id,
-                CONCAT_WS(' ', vet.firstname, vet.lastname) AS vet_name,
-                dog.id as dog_id,
-                dog.name as dog_name,
-                dog.breed as dog_breed,
-                health_problem.health_record_id,
-                health_problem.problem,
-                health_problem.date,
-                health_problem.treatment
-            FROM health_problem
-            JOIN health_record ON health_record.id = health_problem.health_record_id
-            JOIN vet ON health_record.vet_id = vet.id
-            JOIN dog ON health_record.dog_id = dog.id"""
+        view=HEALTH_PROBLEM_VIEW,
+        key="health_problem.id",
+        filters={
+            "health_record_id": ("health_problem.health_record_id", int),
+            "vet_id": ("health_record.vet_id", int),
+            "dog_id": ("health_record.dog_id", int),
+            "dog_breed": ("dog.breed", str),
+            "problem": ("health_problem.problem", str),
+            "date": ("health_problem.date", date),
+        },
+        sorts={
+            "date": "health_problem.date",
+        },
+        indexes=[
+            ("date",),  # date_idx
+            ("health_record_id",),  # fk_health_problem_health_record1_idx
+            ("problem",),  # problem_idx
+            ("problem", "date"),  # problem_date_idx
+        ]
     )
     return response
 
 
 @app.route("/health_problems/<int:id>", methods=["GET"])
-@jwt_required()
 @role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("health_problem", "health_record", "vet", "dog")
 def get_health_problem(id):
     response = get_entity(
-        query="""SELECT 
-                health_problem.id,
-                vet.id as vet_id,
-                CONCAT_WS(' ', vet.firstname, vet.lastname) AS vet_name,
-                dog.id as dog_id,
-                dog.name as dog_name,
-                dog.breed as dog_breed,
-                health_problem.health_record_id,
-                health_problem.problem,
-                health_problem.date,
-                health_problem.treatment
-            FROM health_problem
-            JOIN health_record ON health_record.id = health_problem.health_record_id
-            JOIN vet ON health_record.vet_id = vet.id
-            JOIN dog ON health_record.dog_id = dog.id WHERE health_problem.id = %s""",
-        id=id
+        view=HEALTH_PROBLEM_VIEW,
+        id=id,
+        key="health_problem.id"
     )
     return response
 
 
 @app.route("/health_problems", methods=["POST"])
-@jwt_required()
 @role_required(["vet", "admin"])
 def add_health_problem():
     response = add_entity(
@@ -872,8 +3075,36 @@ def add_health_problem():
     return response
 
 
+@app.route("/health_problems/bulk", methods=["POST"])
+@role_required(["vet", "admin"])
+def add_health_problems():
+    response = add_entities(
+        request=request,
+        entity="health_problem",
+        schema_class=HealthProblemSchema
+    )
+    return response
+
+
+@app.route("/health_problems/bulk", methods=["PUT"])
+@role_required(["vet", "admin"])
+def update_health_problems():
+    response = update_entities(
+        request=request,
+        entity="health_problem",
+        schema_class=HealthProblemSchema
+    )
+    return response
+
+
+@app.route("/health_problems/bulk", methods=["DELETE"])
+@role_required(["admin"])
+def delete_health_problems():
+    response = delete_entities(request=request, entity="health_problem")
+    return response
+
+
 @app.route("/health_problems/<int:id>", methods=["PUT"])
-@jwt_required()
 @role_required(["vet", "admin"])
 def update_health_problem(id):
     response = update_entity(
@@ -886,12 +3117,988 @@ def update_health_problem(id):
 
 
 @app.route("/health_problems/<int:id>", methods=["DELETE"])
-@jwt_required()
 @role_required(["admin"])
 def delete_health_problem(id):
     response = delete_entity(entity="health_problem", id=id)
     return response
 
 
+###################
+### DOG PROFILE ###
+###################
+def fetch_dog_profile(id):
+    # three indexed queries however many records the dog has: the dog with
+    # its litter and parents, its health records (dog_id index), and the
+    # problems of those records (health_record_id index)
+    dogs = data_fetch(
+        """SELECT
+                dog.id,
+                dog.name,
+                dog.gender,
+                dog.breed,
+                dog.litter_id,
+                litter.birthdate,
+                litter.birthplace,
+                litter.sire_id,
+                sire.name AS sire_name,
+                sire.breed AS sire_breed,
+                litter.dam_id,
+                dam.name AS dam_name,
+                dam.breed AS dam_breed
+            FROM dog
+            LEFT JOIN litter ON litter.id = dog.litter_id
+            LEFT JOIN dog sire ON sire.id = litter.sire_id
+            LEFT JOIN dog dam ON dam.id = litter.dam_id
+            WHERE dog.id = %s""",
+        (id,),
+    )
+
+    if not dogs:
+        return None
+
+    row = dogs[0]
+    litter = None
+    if row["litter_id"] is not None:
+        litter = {
+            "id": row["litter_id"],
+            "birthdate": row["birthdate"],
+            "birthplace": row["birthplace"],
+            "sire": {"id": row["sire_id"], "name": row["sire_name"], "breed": row["sire_breed"]},
+            "dam": {"id": row["dam_id"], "name": row["dam_name"], "breed": row["dam_breed"]},
+        }
+
+    records = data_fetch(
+        """SELECT
+                health_record.id,
+                health_record.vet_id,
+                CONCAT_WS(' ', vet.firstname, vet.lastname) AS vet_name
+            FROM health_record
+            JOIN vet ON vet.id = health_record.vet_id
+            WHERE health_record.dog_id = %s
+            ORDER BY health_record.id""",
+        (id,),
+    )
+
+    health_records = {}
+    for record in records:
+        health_records[record["id"]] = {**record, "problems": []}
+
+    if health_records:
+        problems = data_fetch(
+            f"""SELECT id, health_record_id, problem, date, treatment
+                FROM health_problem
+                WHERE health_record_id IN ({placeholders_for(health_records)})
+                ORDER BY date, id""",
+            tuple(health_records),
+        )
+
+        for problem in problems:
+            health_records[problem["health_record_id"]]["problems"].append(problem)
+
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "gender": row["gender"],
+        "breed": row["breed"],
+        "litter": litter,
+        "health_records": list(health_records.values()),
+    }
+
+
+# litters are not visible to vets, so neither is the profile
+@app.route("/dogs/<int:id>/profile", methods=["GET"])
+@role_required(["buyer", "breeder", "admin"])
+@cache_response("dog", "litter", "health_record", "health_problem", "vet")
+def get_dog_profile(id):
+    try:
+        profile = fetch_dog_profile(id)
+
+        if profile is None:
+            return make_response(
+                jsonify({"message": f"no dog found with ID {id}"}), 404
+            )
+
+        return make_response(jsonify(profile), 200)
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify(
+                {"message": "database error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify(
+                {"message": "an unexpected error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+
+################
+### PEDIGREE ###
+################
+def get_depth_arg(args):
+    depth = args.get("depth", app.config["PEDIGREE_DEPTH_DEFAULT"])
+
+    try:
+        depth = int(depth)
+    except (TypeError, ValueError):
+        raise ValueError("depth must be an integer")
+
+    if depth < 1 or depth > app.config["PEDIGREE_DEPTH_MAX"]:
+        raise ValueError(
+            f"depth must be between 1 and {app.config['PEDIGREE_DEPTH_MAX']}")
+
+    return depth
+
+
+def fetch_ancestors(ids, depth):
+    # one batched query per generation; every dog is fetched once even when
+    # it shows up in several branches, and a dog that is (through bad data)
+    # its own ancestor is never queued again, so the walk always ends
+    if app.config["PEDIGREE_INDEX_ENABLED"]:
+        return fetch_indexed_ancestors(ids, depth)
+
+    dogs = {}
+    level = set(ids)
+
+    for generation in range(depth + 1):
+        level = [dog_id for dog_id in level if dog_id not in dogs]
+        if not level:
+            break
+
+        rows = []
+        for chunk in chunked(level, app.config["BULK_CHUNK_SIZE"]):
+            rows.extend(data_fetch(
+                f"""SELECT
+                        dog.id,
+                        dog.name,
+                        dog.gender,
+                        dog.breed,
+                        litter.sire_id,
+                        litter.dam_id
+                    FROM dog
+                    LEFT JOIN litter ON litter.id = dog.litter_id
+                    WHERE dog.id IN ({placeholders_for(chunk)})""",
+                tuple(chunk),
+            ))
+
+        for row in rows:
+            dogs[row["id"]] = row
+
+        level = {
+            parent for row in rows
+            for parent in (row["sire_id"], row["dam_id"]) if parent is not None
+        }
+
+    return dogs
+
+
+def fetch_indexed_ancestors(ids, depth):
+    # the parent links come from the pedigree index, so only the dogs
+    # themselves are read, in one batched query
+    pedigree_index.ensure_fresh()
+    with pedigree_index.lock:
+        links = pedigree_index.ancestors(ids, depth)
+
+    dogs = {}
+    for chunk in chunked(list(links), app.config["BULK_CHUNK_SIZE"]):
+        for row in data_fetch(
+                f"SELECT id, name, gender, breed FROM dog WHERE id IN ({placeholders_for(chunk)})",
+                tuple(chunk)):
+            row["sire_id"], row["dam_id"] = (parent or None for parent in links[row["id"]])
+            dogs[row["id"]] = row
+
+    return dogs
+
+
+def pedigree_tree(dogs, id, depth, path=()):
+    dog = dogs.get(id)
+    if dog is None:
+        return None
+
+    node = {"id": dog["id"], "name": dog["name"], "gender": dog["gender"], "breed": dog["breed"]}
+
+    if id in path:
+        node["cycle"] = True
+        return node
+
+    if depth > 0:
+        path = (*path, id)
+        node["sire"] = pedigree_tree(dogs, dog["sire_id"], depth - 1, path)
+        node["dam"] = pedigree_tree(dogs, dog["dam_id"], depth - 1, path)
+
+    return node
+
+
+@app.route("/dogs/<int:id>/pedigree", methods=["GET"])
+@role_required(["buyer", "breeder", "admin"])
+@cache_response("dog", "litter")
+def get_dog_pedigree(id):
+    try:
+        depth = get_depth_arg(request.args)
+        dogs = fetch_ancestors([id], depth)
+
+        if id not in dogs:
+            return make_response(
+                jsonify({"message": f"no dog found with ID {id}"}), 404
+            )
+
+        return make_response(jsonify(pedigree_tree(dogs, id, depth)), 200)
+
+    except ValueError as ve:
+        return make_response(
+            jsonify(
+                {"message": "invalid query parameters", "error": str(ve)}
+            ),
+            400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify(
+                {"message": "database error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify(
+                {"message": "an unexpected error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+
+###################
+### DESCENDANTS ###
+###################
+class DescendantWalk:
+    # one batched query per generation: the litters with a parent in the
+    # current generation, joined to their puppies. Dogs already seen are not
+    # expanded again, so cycles in bad data end the walk, and it stops once
+    # DESCENDANTS_MAX_ROWS dogs have been found (truncated is then set)
+    def __init__(self, id, depth):
+        self.id = id
+        self.depth = depth
+        self.limit = app.config["DESCENDANTS_MAX_ROWS"]
+        self.count = 0
+        self.truncated = False
+
+    def fetch_offspring(self, parents):
+        rows = []
+
+        for chunk in chunked(parents, app.config["BULK_CHUNK_SIZE"]):
+            found = data_fetch(
+                f"""SELECT
+                        dog.id,
+                        dog.name,
+                        dog.gender,
+                        dog.breed,
+                        dog.litter_id,
+                        litter.sire_id,
+                        litter.dam_id,
+                        litter.birthdate
+                    FROM litter
+                    JOIN dog ON dog.litter_id = litter.id
+                    WHERE litter.sire_id IN ({placeholders_for(chunk)})
+                        OR litter.dam_id IN ({placeholders_for(chunk)})
+                    ORDER BY dog.id
+                    LIMIT %s""",
+                (*chunk, *chunk, self.limit + 1),
+            )
+
+            if len(found) > self.limit:
+                self.truncated = True
+                found = found[:self.limit]
+
+            rows.extend(found)
+
+        return rows
+
+    def __iter__(self):
+        # yields (generation, rows) with the dogs first found in it
+        seen = {self.id}
+        level = [self.id]
+
+        for generation in range(1, self.depth + 1):
+            if not level or self.truncated:
+                return
+
+            rows = []
+            for row in self.fetch_offspring(level):
+                if row["id"] not in seen:
+                    seen.add(row["id"])
+                    rows.append(row)
+
+            if self.count + len(rows) > self.limit:
+                self.truncated = True
+                rows = rows[:self.limit - self.count]
+
+            self.count += len(rows)
+            level = [row["id"] for row in rows]
+
+            if rows:
+                yield generation, rows
+
+
+def litter_tree(dog, litters, depth):
+    # built breadth first, like the walk, so each dog is expanded where it
+    # sits at the generation the walk found it in and keeps all the depth
+    # left below it. Any other copy (reached through both of its parents, a
+    # longer path such as a sire x daughter litter, or a cycle) is listed
+    # without its litters, which keeps the tree as large as the rows rather
+    # than the paths through them
+    def dog_node(dog):
+        return {key: dog[key] for key in ("id", "name", "gender", "breed")}
+
+    root = dog_node(dog)
+    expanded = {dog["id"]}
+    queue = deque([(root, dog["id"], 0)])
+
+    while queue:
+        node, id, generation = queue.popleft()
+
+        if generation == depth:
+            continue
+
+        node["litters"] = []
+        for litter in litters.get(id, {}).values():
+            offspring = []
+
+            for puppy in litter["offspring"]:
+                child = dog_node(puppy)
+
+                if puppy["id"] in expanded:
+                    child["repeated"] = True
+                else:
+                    expanded.add(puppy["id"])
+                    queue.append((child, puppy["id"], generation + 1))
+
+                offspring.append(child)
+
+            node["litters"].append({
+                "id": litter["id"],
+                "sire_id": litter["sire_id"],
+                "dam_id": litter["dam_id"],
+                "birthdate": litter["birthdate"],
+                "offspring": offspring,
+            })
+
+    return root
+
+
+def stream_descendants(walk):
+    def generate():
+        for generation, rows in walk:
+            yield "".join(
+                f"{app.json.dumps({'generation': generation, **row})}\n" for row in rows)
+
+        if walk.truncated:
+            yield f"{app.json.dumps({'truncated': True})}\n"
+
+    return Response(stream_with_context(generate()), 200, mimetype="application/x-ndjson")
+
+
+@app.route("/dogs/<int:id>/descendants", methods=["GET"])
+@role_required(["buyer", "breeder", "admin"])
+@cache_response("dog", "litter")
+def get_dog_descendants(id):
+    try:
+        depth = get_depth_arg(request.args)
+        dogs = data_fetch("SELECT id, name, gender, breed FROM dog WHERE id = %s", (id,))
+
+        if not dogs:
+            return make_response(
+                jsonify({"message": f"no dog found with ID {id}"}), 404
+            )
+
+        walk = DescendantWalk(id, depth)
+
+        if wants_stream():
+            return stream_descendants(walk)
+
+        litters = {}
+        for _, rows in walk:
+            for row in rows:
+                for parent in (row["sire_id"], row["dam_id"]):
+                    litter = litters.setdefault(parent, {}).setdefault(row["litter_id"], {
+                        "id": row["litter_id"],
+                        "sire_id": row["sire_id"],
+                        "dam_id": row["dam_id"],
+                        "birthdate": row["birthdate"],
+                        "offspring": [],
+                    })
+                    litter["offspring"].append(row)
+
+        return make_response(
+            jsonify(
+                {
+                    "dog": litter_tree(dogs[0], litters, depth),
+                    "count": walk.count,
+                    "truncated": walk.truncated,
+                }
+            ),
+            200
+        )
+
+    except ValueError as ve:
+        return make_response(
+            jsonify(
+                {"message": "invalid query parameters", "error": str(ve)}
+            ),
+            400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify(
+                {"message": "database error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify(
+                {"message": "an unexpected error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+
+###############################
+### INBREEDING COEFFICIENTS ###
+###############################
+class PedigreeGraph:
+    # parent links kept as two integer arrays: slots maps a dog id to its
+    # position, sires[position] / dams[position] hold the parents' dog ids
+    # (0 when unknown, MySQL ids start at 1)
+    def __init__(self):
+        self.slots = {}
+        self.sires = array("q")
+        self.dams = array("q")
+
+    def __contains__(self, id):
+        return id in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def set_parents(self, id, sire_id, dam_id):
+        slot = self.slots.get(id)
+
+        if slot is None:
+            self.slots[id] = len(self.sires)
+            self.sires.append(sire_id or 0)
+            self.dams.append(dam_id or 0)
+        else:
+            self.sires[slot] = sire_id or 0
+            self.dams[slot] = dam_id or 0
+
+    def parents(self, id):
+        slot = self.slots[id]
+        return self.sires[slot], self.dams[slot]
+
+
+def number_pedigree(graph, roots, generations):
+    # the ancestors of roots (the planned parents) within `generations`
+    # generations of the offspring. The cutoff is per parent: a dog becomes
+    # one node per generation it is reached at, (id, generation), and only
+    # nodes below the cutoff have parents, so each root sees the same
+    # pedigree whatever roots are numbered with it. Nodes are renumbered
+    # 0..n-1 so that parents come before their offspring. Returns the node
+    # numbering and the parent numbers (-1 when unknown or cut off) and dog
+    # id of every node
+    depth = {}
+    level = [root for root in roots if root in graph]
+
+    for generation in range(generations):
+        upper = []
+
+        for id in level:
+            if id in depth:
+                continue
+
+            depth[id] = generation
+            if generation + 1 < generations:
+                upper.extend(
+                    parent for parent in graph.parents(id) if parent and parent in graph)
+
+        level = upper
+
+    def local_parents(id):
+        if depth[id] + 1 >= generations:
+            return 0, 0
+        return tuple(parent if parent in depth else 0 for parent in graph.parents(id))
+
+    # iterative depth-first walk ranking every dog after its parents. A
+    # parent still in progress means a cycle in the data and is dropped
+    ranks = {}
+    links = {}
+    in_progress = set()
+
+    for root in depth:
+        stack = [root]
+
+        while stack:
+            id = stack[-1]
+
+            if id in ranks:
+                stack.pop()
+                continue
+
+            if id not in in_progress:
+                in_progress.add(id)
+                stack.extend(
+                    parent for parent in local_parents(id)
+                    if parent and parent not in ranks and parent not in in_progress)
+                continue
+
+            stack.pop()
+            in_progress.discard(id)
+            ranks[id] = len(ranks)
+            links[id] = tuple(parent if parent in ranks else 0 for parent in local_parents(id))
+
+    nodes = set()
+    level = {(root, 0) for root in roots if root in graph}
+
+    while level:
+        nodes |= level
+        level = {
+            (parent, generation + 1)
+            for id, generation in level if generation + 1 < generations
+            for parent in links[id] if parent
+        } - nodes
+
+    # by rank, then the same dog's nearer nodes last: a higher number is
+    # never an ancestor of a lower one
+    ordered = sorted(nodes, key=lambda node: (ranks[node[0]], -node[1]))
+    numbers = {node: number for number, node in enumerate(ordered)}
+    sires = array("q")
+    dams = array("q")
+    dogs = array("q")
+
+    for id, generation in ordered:
+        sire_id, dam_id = links[id] if generation + 1 < generations else (0, 0)
+        sires.append(numbers.get((sire_id, generation + 1), -1))
+        dams.append(numbers.get((dam_id, generation + 1), -1))
+        dogs.append(id)
+
+    return numbers, sires, dams, dogs
+
+
+class KinshipTable:
+    # Wright's kinship over a pedigree numbered parents-first: for a != b
+    # the younger one (higher number) cannot be an ancestor of the other,
+    # so f(a, b) = (f(sire(a), b) + f(dam(a), b)) / 2 and
+    # f(a, a) = (1 + f(sire(a), dam(a))) / 2. Two nodes of the same dog are
+    # the same animal and count as a == b. Every pair is computed once
+    def __init__(self, sires, dams, dogs):
+        self.sires = sires
+        self.dams = dams
+        self.dogs = dogs
+        self.memo = {}
+
+    def kinship(self, a, b):
+        if a < 0 or b < 0:
+            return 0.0
+
+        if a < b:
+            a, b = b, a
+
+        value = self.memo.get((a, b))
+        if value is None:
+            if self.dogs[a] == self.dogs[b]:
+                value = 0.5 * (1.0 + self.kinship(self.sires[a], self.dams[a]))
+            else:
+                value = 0.5 * (self.kinship(self.sires[a], b) + self.kinship(self.dams[a], b))
+            self.memo[(a, b)] = value
+
+        return value
+
+
+def coefficient_of_inbreeding(graph, sire_id, dam_id, generations):
+    # the COI of a puppy is the kinship of its parents
+    numbers, sires, dams, dogs = number_pedigree(graph, (sire_id, dam_id), generations)
+    table = KinshipTable(sires, dams, dogs)
+    coi = table.kinship(numbers.get((sire_id, 0), -1), numbers.get((dam_id, 0), -1))
+    return coi, len(set(dogs))
+
+
+def load_pedigree_graph(ids, generations):
+    graph = PedigreeGraph()
+
+    for row in fetch_ancestors(ids, generations - 1).values():
+        graph.set_parents(row["id"], row["sire_id"], row["dam_id"])
+
+    return graph
+
+
+def get_int_arg(args, name):
+    value = args.get(name)
+
+    if value is None:
+        raise ValueError(f"{name} is required")
+
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+
+def get_generations_arg(args):
+    generations = args.get("generations", app.config["COI_GENERATIONS_DEFAULT"])
+
+    try:
+        generations = int(generations)
+    except (TypeError, ValueError):
+        raise ValueError("generations must be an integer")
+
+    if generations < 1 or generations > app.config["COI_GENERATIONS_MAX"]:
+        raise ValueError(
+            f"generations must be between 1 and {app.config['COI_GENERATIONS_MAX']}")
+
+    return generations
+
+
+@app.route("/coi", methods=["GET"])
+@role_required(["buyer", "breeder", "admin"])
+@cache_response("dog", "litter")
+def get_coi():
+    try:
+        sire_id = get_int_arg(request.args, "sire_id")
+        dam_id = get_int_arg(request.args, "dam_id")
+        generations = get_generations_arg(request.args)
+
+        if app.config["PEDIGREE_INDEX_ENABLED"]:
+            pedigree_index.ensure_fresh()
+            graph = pedigree_index
+        else:
+            graph = load_pedigree_graph((sire_id, dam_id), generations)
+
+        with pedigree_index.lock:
+            for id in (sire_id, dam_id):
+                if id not in graph:
+                    return make_response(
+                        jsonify({"message": f"no dog found with ID {id}"}), 404
+                    )
+
+            coi, ancestors = coefficient_of_inbreeding(graph, sire_id, dam_id, generations)
+
+        return make_response(
+            jsonify(
+                {
+                    "sire_id": sire_id,
+                    "dam_id": dam_id,
+                    "generations": generations,
+                    "ancestors": ancestors,
+                    "coi": coi,
+                }
+            ),
+            200
+        )
+
+    except ValueError as ve:
+        return make_response(
+            jsonify(
+                {"message": "invalid query parameters", "error": str(ve)}
+            ),
+            400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify(
+                {"message": "database error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify(
+                {"message": "an unexpected error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+
+########################
+### MATE SUGGESTIONS ###
+########################
+def get_limit_arg(args, default, maximum):
+    limit = args.get("limit", default)
+
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+
+    if limit < 1 or limit > maximum:
+        raise ValueError(f"limit must be between 1 and {maximum}")
+
+    return limit
+
+
+def fetch_problem_masks(ids):
+    # one bit per distinct problem recorded for any of the dogs
+    bits = {}
+    masks = {}
+
+    for chunk in chunked(list(ids), app.config["BULK_CHUNK_SIZE"]):
+        rows = data_fetch(
+            f"""SELECT DISTINCT health_record.dog_id, health_problem.problem
+                FROM health_record
+                JOIN health_problem ON health_problem.health_record_id = health_record.id
+                WHERE health_record.dog_id IN ({placeholders_for(chunk)})""",
+            tuple(chunk),
+        )
+
+        for row in rows:
+            bit = bits.setdefault(row["problem"], 1 << len(bits))
+            masks[row["dog_id"]] = masks.get(row["dog_id"], 0) | bit
+
+    return masks, list(bits)
+
+
+def ancestry(graph, root, generations):
+    # root and its ancestors within `generations` generations of a puppy of
+    # root's, the same cutoff number_pedigree applies to each parent
+    seen = set()
+    level = [root] if root in graph else []
+
+    for generation in range(generations):
+        upper = []
+
+        for id in level:
+            if id in seen:
+                continue
+
+            seen.add(id)
+            upper.extend(parent for parent in graph.parents(id) if parent and parent in graph)
+
+        level = upper
+
+    return seen
+
+
+def suggest_mates(graph, dog, candidates, generations, limit):
+    # the dog and every candidate are numbered in one pass and share one
+    # kinship table; the cutoff is per parent, so each pairing gets the COI
+    # GET /coi returns for it. graph must not change meanwhile, pass a
+    # snapshot of the pedigree index. Problems are bitmasks ORed over each
+    # dog's own ancestry, and the best pairings are picked with a heap
+    # instead of sorting every candidate
+    roots = (dog["id"], *(candidate["id"] for candidate in candidates))
+    numbers, sires, dams, dogs = number_pedigree(graph, roots, generations)
+    table = KinshipTable(sires, dams, dogs)
+    own = numbers.get((dog["id"], 0), -1)
+    cois = {
+        candidate["id"]: table.kinship(own, numbers.get((candidate["id"], 0), -1))
+        for candidate in candidates
+    }
+    lines = {root: ancestry(graph, root, generations) for root in roots}
+
+    masks, problems = fetch_problem_masks(set().union(*lines.values()))
+
+    def lineage(root):
+        mask = 0
+        for id in lines[root]:
+            mask |= masks.get(id, 0)
+        return mask
+
+    own_lineage = lineage(dog["id"])
+
+    def score(candidate):
+        shared = own_lineage & lineage(candidate["id"])
+        return cois[candidate["id"]], bin(shared).count("1"), candidate["id"], shared
+
+    scored = (score(candidate) + (candidate,) for candidate in candidates)
+    best = heapq.nsmallest(limit, scored, key=lambda item: item[:3])
+
+    return [
+        {
+            **candidate,
+            "coi": coi,
+            "shared_health_problems": count,
+            "problems": [problem for bit, problem in enumerate(problems) if shared >> bit & 1],
+        }
+        for coi, count, _, shared, candidate in best
+    ]
+
+
+@app.route("/dogs/<int:id>/mate_suggestions", methods=["GET"])
+@role_required(["buyer", "breeder", "admin"])
+@cache_response("dog", "litter", "health_record", "health_problem")
+def get_mate_suggestions(id):
+    try:
+        limit = get_limit_arg(
+            request.args,
+            app.config["MATE_SUGGESTIONS_LIMIT_DEFAULT"],
+            app.config["MATE_SUGGESTIONS_LIMIT_MAX"],
+        )
+        generations = get_generations_arg(request.args)
+        dogs = data_fetch("SELECT id, name, gender, breed FROM dog WHERE id = %s", (id,))
+
+        if not dogs:
+            return make_response(
+                jsonify({"message": f"no dog found with ID {id}"}), 404
+            )
+
+        dog = dogs[0]
+        breed = request.args.get("breed", dog["breed"])
+
+        # served by breed_gender_idx
+        candidates = data_fetch(
+            "SELECT id, name, gender, breed FROM dog WHERE breed = %s AND gender = %s AND id <> %s",
+            (breed, 1 - dog["gender"], id),
+        )
+
+        ids = [id, *(candidate["id"] for candidate in candidates)]
+
+        if app.config["PEDIGREE_INDEX_ENABLED"]:
+            pedigree_index.ensure_fresh()
+            graph = pedigree_index.snapshot()
+        else:
+            graph = load_pedigree_graph(ids, generations)
+
+        suggestions = suggest_mates(graph, dog, candidates, generations, limit)
+
+        return make_response(
+            jsonify(
+                {
+                    "dog": dog,
+                    "breed": breed,
+                    "candidates": len(candidates),
+                    "suggestions": suggestions,
+                }
+            ),
+            200
+        )
+
+    except ValueError as ve:
+        return make_response(
+            jsonify(
+                {"message": "invalid query parameters", "error": str(ve)}
+            ),
+            400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify(
+                {"message": "database error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify(
+                {"message": "an unexpected error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+
+########################
+### HEALTH ANALYTICS ###
+########################
+def get_group_by(args, columns):
+    group_by = args.get("group_by")
+
+    if group_by is None:
+        return list(columns)
+
+    names = list(dict.fromkeys(name for name in group_by.split(",") if name))
+    if not names:
+        raise ValueError("group_by needs at least one field")
+
+    for name in names:
+        if name not in columns:
+            allowed = ", ".join(columns)
+            raise ValueError(f"cannot group by '{name}', groupable fields are: {allowed}")
+
+    return names
+
+
+def get_health_analytics(name, filters):
+    try:
+        # filters maps a query argument to its type; the column comes from
+        # the summary, so the same filters work with summaries switched off
+        columns = health_summaries.columns(name)
+        group_by = get_group_by(request.args, columns)
+        conditions, params = get_filters(
+            request.args, {field: (columns[field], kind) for field, kind in filters.items()})
+
+        data = health_summaries.read(name, group_by, conditions, params)
+
+        return make_response(jsonify(data), 200)
+
+    except ValueError as ve:
+        return make_response(
+            jsonify(
+                {"message": "invalid query parameters", "error": str(ve)}
+            ),
+            400
+        )
+
+    except MySQLdb.Error as e:
+        return make_response(
+            jsonify(
+                {"message": "database error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+    except Exception as e:
+        return make_response(
+            jsonify(
+                {"message": "an unexpected error occurred", "error": str(e)}
+            ),
+            500
+        )
+
+
+@app.route("/analytics/health/breeds", methods=["GET"])
+@role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("health_problem", "health_record", "dog")
+def get_health_analytics_by_breed():
+    return get_health_analytics(
+        "breeds",
+        filters={"breed": str, "problem": str, "month": date},
+    )
+
+
+@app.route("/analytics/health/vets", methods=["GET"])
+@role_required(["buyer", "breeder", "vet", "admin"])
+@cache_response("health_problem", "health_record", "dog")
+def get_health_analytics_by_vet():
+    return get_health_analytics(
+        "vets",
+        filters={"vet_id": int, "problem": str, "month": date},
+    )
+
+
+@app.cli.command("rebuild-health-summaries")
+def rebuild_health_summaries_command():
+    # recounts every summary from health_problem, for data loaded with the
+    # summaries switched off or written around the API
+    cur = mysql.connection.cursor()
+    try:
+        health_summaries.rebuild(cur)
+        mysql.connection.commit()
+        response_cache.invalidate("health_problem")
+    finally:
+        cur.close()
+
+    click.echo(f"rebuilt {', '.join(table for table, _ in health_summaries.TABLES.values())}")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
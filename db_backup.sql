@@ -27,8 +27,11 @@ CREATE TABLE IF NOT EXISTS `dog_breeding`.`litter` (
   `birthdate` DATE NOT NULL,
   `birthplace` VARCHAR(135) NOT NULL,
   PRIMARY KEY (`id`),
-  INDEX `fk_litter_dog_idx` (`sire_id` ASC) VISIBLE,
+  INDEX `sire_dam_idx` (`sire_id` ASC, `dam_id` ASC) VISIBLE,
   INDEX `fk_litter_dog1_idx` (`dam_id` ASC) VISIBLE,
+  INDEX `birthdate_idx` (`birthdate` ASC) VISIBLE,
+  INDEX `sire_birthdate_idx` (`sire_id` ASC, `birthdate` ASC) VISIBLE,
+  INDEX `dam_birthdate_idx` (`dam_id` ASC, `birthdate` ASC) VISIBLE,
   CONSTRAINT `fk_litter_dog`
     FOREIGN KEY (`sire_id`)
     REFERENCES `dog_breeding`.`dog` (`id`)
@@ -53,6 +56,8 @@ CREATE TABLE IF NOT EXISTS `dog_breeding`.`dog` (
   `breed` VARCHAR(45) NOT NULL,
   PRIMARY KEY (`id`),
   INDEX `fk_dog_litter1_idx` (`litter_id` ASC) VISIBLE,
+  INDEX `breed_idx` (`breed` ASC) VISIBLE,
+  INDEX `breed_gender_idx` (`breed` ASC, `gender` ASC) VISIBLE,
   CONSTRAINT `fk_dog_litter1`
     FOREIGN KEY (`litter_id`)
     REFERENCES `dog_breeding`.`litter` (`id`)
@@ -108,6 +113,9 @@ CREATE TABLE IF NOT EXISTS `dog_breeding`.`health_problem` (
   `treatment` VARCHAR(135) NULL,
   PRIMARY KEY (`id`),
   INDEX `fk_health_problem_health_record1_idx` (`health_record_id` ASC) VISIBLE,
+  INDEX `date_idx` (`date` ASC) VISIBLE,
+  INDEX `problem_idx` (`problem` ASC) VISIBLE,
+  INDEX `problem_date_idx` (`problem` ASC, `date` ASC) VISIBLE,
   CONSTRAINT `fk_health_problem_health_record1`
     FOREIGN KEY (`health_record_id`)
     REFERENCES `dog_breeding`.`health_record` (`id`)
@@ -137,7 +145,46 @@ CREATE TABLE IF NOT EXISTS `dog_breeding`.`token_blacklist` (
   `jti` VARCHAR(255) NOT NULL,
   `expiration` DATETIME NOT NULL,
   PRIMARY KEY (`id`),
-  UNIQUE INDEX `jti_UNIQUE` (`jti` ASC) VISIBLE)
+  UNIQUE INDEX `jti_UNIQUE` (`jti` ASC) VISIBLE,
+  INDEX `expiration_idx` (`expiration` ASC) VISIBLE)
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `dog_breeding`.`pedigree_version`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `dog_breeding`.`pedigree_version` (
+  `id` INT NOT NULL,
+  `version` BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`id`))
+ENGINE = InnoDB;
+
+INSERT IGNORE INTO `dog_breeding`.`pedigree_version` (`id`, `version`) VALUES (1, 0);
+
+
+-- -----------------------------------------------------
+-- Table `dog_breeding`.`health_problem_by_breed`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `dog_breeding`.`health_problem_by_breed` (
+  `breed` VARCHAR(45) NOT NULL,
+  `problem` VARCHAR(135) NOT NULL,
+  `month` DATE NOT NULL,
+  `problems` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`breed`, `problem`, `month`),
+  INDEX `month_idx` (`month` ASC) VISIBLE)
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `dog_breeding`.`health_problem_by_vet`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `dog_breeding`.`health_problem_by_vet` (
+  `vet_id` INT NOT NULL,
+  `problem` VARCHAR(135) NOT NULL,
+  `month` DATE NOT NULL,
+  `problems` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`vet_id`, `problem`, `month`),
+  INDEX `month_idx` (`month` ASC) VISIBLE)
 ENGINE = InnoDB;
 
 
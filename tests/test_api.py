@@ -2,12 +2,18 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from api import app, bcrypt, DogSchema
+from api import app, bcrypt, DogSchema, revoked_tokens, ConnectionPool, PoolTimeoutError, PasswordHasher, PasswordHasherBusy, password_hasher, rehash_password, response_cache, OrjsonProvider, StatementCache, statement_cache, pedigree_index, PedigreeGraph, coefficient_of_inbreeding, suggest_mates
 from dotenv import load_dotenv
+from flask import g
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime
 from flask_jwt_extended import create_access_token
 from unittest.mock import patch, MagicMock
 from unittest import mock
+import MySQLdb
+import base64
 import pytest
+import time
 
 load_dotenv(verbose=True, override=True)
 
@@ -22,6 +28,11 @@ def client():
     app.config["TESTING"] = True
     app.config["DEBUG"] = True
     app.config["DISABLE_BLACKLIST_CHECK"] = True
+    # the mocked cursors below return dict rows
+    app.config["COMPACT_ROWS"] = False
+    app.config["PEDIGREE_INDEX_ENABLED"] = False
+    app.config["HEALTH_SUMMARY_ENABLED"] = False
+    response_cache.backend.clear()
 
     with patch("api.mysql") as mock_mysql:
         mock_cursor = MagicMock()
@@ -94,12 +105,6 @@ def test_login_success(client):
 
 
 
-#######################################################################
-# THESE TESTS WON'T WORK UNLESS YOU COMMENT OUT api.check_if_token_in_blacklist() FUNCTION FIRST
-# WILL SOON FIND A WAY TO WORK THIS OUT
-#######################################################################
-
-
 #######################################
 ### TESTS FOR CRUD ROUTES (SUCCESS) ###
 #######################################
@@ -779,3 +784,1450 @@ def test_delete_health_problem_unauthorized(client):
     assert "access forbidden: insufficient permissions" in response.get_json()[
         "message"]
 
+
+
+############################
+### TESTS FOR PAGINATION ###
+############################
+def test_get_dogs_paginated(client):
+    client, mock_mysql = client
+
+    dogs = [
+        {"id": 1, "name": "Buddy", "gender": 0, "breed": "Labrador"},
+        {"id": 2, "name": "Bella", "gender": 1, "breed": "Beagle"},
+        {"id": 3, "name": "Max", "gender": 0, "breed": "Pug"},
+    ]
+    setup_mock_db(mock_mysql, query_result=dogs)
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs?limit=2", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Get Dogs Paginated Response: {response.json}")
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+    assert 'rel="next"' in response.headers["Link"]
+
+    cursor = response.headers["X-Next-Cursor"]
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    setup_mock_db(mock_mysql, query_result=dogs[2:])
+
+    response = client.get(
+        f"/dogs?limit=2&after={cursor}", headers={"Authorization": f"Bearer {token}"})
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert "WHERE id > %s" in query
+    assert params == (2, 3)
+    assert len(response.get_json()) == 1
+    assert "Link" not in response.headers
+
+
+def test_get_dogs_invalid_cursor(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, query_result=[])
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs?after=not-a-cursor", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Get Dogs Invalid Cursor Response: {response.json}")
+    assert response.status_code == 400
+    assert "invalid query parameters" in response.get_json()["message"]
+
+
+###########################
+### TESTS FOR STREAMING ###
+###########################
+def test_get_health_problems_stream(client):
+    client, mock_mysql = client
+
+    health_problems = [
+        {"id": 1, "health_record_id": 1, "problem": "Fever",
+            "date": "2024-12-01", "treatment": "Antibiotics"},
+        {"id": 2, "health_record_id": 2, "problem": "Cough",
+            "date": "2024-12-05", "treatment": "Cough Syrup"}
+    ]
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchmany.side_effect = [health_problems[:1], health_problems[1:], []]
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/health_problems",
+        headers={"Authorization": f"Bearer {token}",
+                 "Accept": "application/x-ndjson"})
+
+    lines = response.get_data(as_text=True).splitlines()
+    print(f"Get Health Problems Stream Response: {lines}")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert len(lines) == len(health_problems)
+    assert "LIMIT" not in mock_cursor.execute.call_args[0][0]
+    mock_cursor.fetchall.assert_not_called()
+
+
+##############################
+### TESTS FOR COMPACT ROWS ###
+##############################
+def test_compact_rows_match_dict_rows(client):
+    client, mock_mysql = client
+
+    health_problems = [
+        {"id": 1, "vet_id": 1, "vet_name": "John Doe", "dog_id": 1,
+            "dog_name": "Buddy", "dog_breed": "Labrador", "health_record_id": 1,
+            "problem": "Fever", "date": date(2024, 12, 1), "treatment": None},
+        {"id": 2, "vet_id": 2, "vet_name": "Jane Smith", "dog_id": 2,
+            "dog_name": "Bella", "dog_breed": "Beagle", "health_record_id": 2,
+            "problem": "Cough", "date": date(2024, 12, 5), "treatment": "Cough Syrup"},
+    ]
+    setup_mock_db(mock_mysql, query_result=health_problems)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    app.config["DEBUG"] = False
+    try:
+        expected = client.get("/health_problems?limit=1", headers=headers)
+
+        response_cache.backend.clear()
+        app.config["COMPACT_ROWS"] = True
+        mock_cursor.description = [(name,) for name in health_problems[0]]
+        mock_cursor.fetchall.return_value = [
+            tuple(row.values()) for row in health_problems]
+
+        response = client.get("/health_problems?limit=1", headers=headers)
+    finally:
+        app.config["DEBUG"] = True
+        app.config["COMPACT_ROWS"] = False
+
+    print(f"Compact Rows Response: {response.get_data()}")
+    assert response.status_code == 200
+    assert response.get_data() == expected.get_data()
+    assert response.headers["X-Next-Cursor"] == expected.headers["X-Next-Cursor"]
+    assert response.headers["ETag"] == expected.headers["ETag"]
+
+
+################################
+### TESTS FOR DB ROUND TRIPS ###
+################################
+def test_authenticated_request_round_trips(client):
+    client, mock_mysql = client
+
+    dogs = [{"id": 1, "name": "Buddy", "gender": 0, "breed": "Labrador"}]
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchall.side_effect = [[], dogs]
+
+    revoked_tokens.clear()
+    app.config["DISABLE_BLACKLIST_CHECK"] = False
+    try:
+        token = generate_token("admin", "admin")
+        with client:
+            response = client.get(
+                "/dogs", headers={"Authorization": f"Bearer {token}"})
+            round_trips = g.db_round_trips
+    finally:
+        app.config["DISABLE_BLACKLIST_CHECK"] = True
+
+    blacklist_lookups = [
+        call for call in mock_cursor.execute.call_args_list
+        if "token_blacklist" in call[0][0]
+    ]
+    print(f"Round Trips: {round_trips}")
+    assert response.status_code == 200
+    assert len(blacklist_lookups) == 1
+    assert round_trips == 2
+
+
+def test_revoked_token_cache_skips_db(client):
+    client, mock_mysql = client
+
+    dogs = [{"id": 1, "name": "Buddy", "gender": 0, "breed": "Labrador"}]
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchall.side_effect = [[], dogs, dogs]
+
+    revoked_tokens.clear()
+    app.config["DISABLE_BLACKLIST_CHECK"] = False
+    try:
+        token = generate_token("admin", "admin")
+        for _ in range(2):
+            response = client.get(
+                "/dogs", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+
+        response = client.post(
+            "/auth/logout", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+
+        response = client.get(
+            "/dogs", headers={"Authorization": f"Bearer {token}"})
+    finally:
+        app.config["DISABLE_BLACKLIST_CHECK"] = True
+
+    blacklist_lookups = [
+        call for call in mock_cursor.execute.call_args_list
+        if call[0][0].lstrip().startswith("SELECT") and "token_blacklist" in call[0][0]
+    ]
+    print(f"Revoked Token Response: {response.json}")
+    assert len(blacklist_lookups) == 1
+    assert response.status_code == 401
+    assert "token has been revoked" in response.get_json()["message"]
+
+
+def test_revoked_token_cache_sees_out_of_order_commits(client):
+    client, mock_mysql = client
+
+    expiration = datetime.fromtimestamp(time.time() + 3600)
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    # logout B (id 11) commits before logout A (id 10)
+    mock_cursor.fetchall.side_effect = [
+        [{"jti": "b", "expiration": expiration}],
+        [{"jti": "a", "expiration": expiration}, {"jti": "b", "expiration": expiration}],
+    ]
+
+    revoked_tokens.clear()
+    revoked_tokens.refresh(time.time())
+    assert revoked_tokens.is_revoked("a") is False
+
+    revoked_tokens.refresh(time.time())
+    revoked = revoked_tokens.is_revoked("a")
+    revoked_tokens.clear()
+
+    query, params = mock_cursor.execute.call_args[0]
+    print(f"Revoked Token Refresh Query: {query}, Params: {params}")
+    assert revoked is True
+    assert "id >" not in query
+
+
+#########################################
+### TESTS FOR TOKEN BLACKLIST PRUNING ###
+#########################################
+def test_prune_token_blacklist(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    batches = iter([2, 2, 1])
+
+    def execute(query, params=None):
+        mock_cursor.rowcount = next(batches)
+
+    mock_cursor.execute.side_effect = execute
+
+    result = app.test_cli_runner().invoke(
+        args=["prune-token-blacklist", "--batch-size", "2"])
+
+    print(f"Prune Output: {result.output}")
+    assert result.exit_code == 0
+    assert "removed 5 expired tokens" in result.output
+    assert mock_mysql.connection.commit.call_count == 3
+
+
+#################################
+### TESTS FOR CONNECTION POOL ###
+#################################
+def test_connection_pool_reuses_connections():
+    created = []
+
+    def creator():
+        conn = MagicMock()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(creator, size=1, max_overflow=1, timeout=0.01)
+
+    conn, born = pool.checkout()
+    pool.checkin(conn, born)
+    conn, born = pool.checkout()
+    overflow, overflow_born = pool.checkout()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.checkout()
+
+    stats = pool.stats()
+    print(f"Pool Stats: {stats}")
+    assert len(created) == 2
+    assert stats["in_use"] == 2
+    assert stats["timeouts"] == 1
+
+    pool.checkin(overflow, overflow_born)
+    pool.checkin(conn, born)
+
+    stats = pool.stats()
+    assert stats["idle"] == 1
+    assert stats["total"] == 1
+    assert sum(conn.close.call_count for conn in created) == 1
+
+
+def test_connection_pool_replaces_dead_connection():
+    conn = MagicMock()
+    conn.ping.side_effect = MySQLdb.OperationalError("gone away")
+    fresh = MagicMock()
+    connections = iter([conn, fresh])
+
+    pool = ConnectionPool(lambda: next(connections), size=1, max_overflow=0)
+
+    first, born = pool.checkout()
+    pool.checkin(first, born)
+    second, born = pool.checkout()
+
+    assert second is fresh
+    conn.close.assert_called_once()
+
+
+def test_pool_timeout_is_a_database_error(client):
+    client, mock_mysql = client
+
+    mock_mysql.connection.cursor.side_effect = PoolTimeoutError("no free connection")
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs/1/profile", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Pool Timeout Response: {response.json}")
+    assert response.status_code == 500
+    assert response.get_json()["message"] == "database error occurred"
+
+
+def test_pool_timeout_fails_blacklist_check_closed(client):
+    client, mock_mysql = client
+
+    mock_mysql.connection.cursor.side_effect = PoolTimeoutError("no free connection")
+
+    revoked_tokens.clear()
+    app.config["DISABLE_BLACKLIST_CHECK"] = False
+    try:
+        token = generate_token("admin", "admin")
+        response = client.get(
+            "/dogs", headers={"Authorization": f"Bearer {token}"})
+    finally:
+        app.config["DISABLE_BLACKLIST_CHECK"] = True
+        revoked_tokens.clear()
+
+    print(f"Blacklist Pool Timeout Response: {response.json}")
+    assert response.status_code == 503
+
+
+def test_get_stats_success(client):
+    client, mock_mysql = client
+
+    mock_mysql.pool.stats.return_value = {"in_use": 1, "idle": 4}
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/admin/stats", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Get Stats Response: {response.json}")
+    assert response.status_code == 200
+    assert response.get_json()["db_pool"]["idle"] == 4
+
+
+##################################
+### TESTS FOR PASSWORD HASHING ###
+##################################
+def test_login_password_hasher_busy(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, query_result=[
+        {"email": "test@example.com", "password": "hash", "role": "admin"}
+    ])
+
+    with patch.object(password_hasher, "in_flight", password_hasher.queue_depth):
+        response = client.post(
+            "/auth/login",
+            json={"email": "test@example.com", "password": "password123"},
+        )
+
+    print(f"Login Busy Response: {response.json}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(
+        app.config["PASSWORD_HASH_RETRY_AFTER"])
+
+
+def test_password_hasher_holds_slot_until_timed_out_call_finishes():
+    hasher = PasswordHasher(workers=1, queue_depth=1, timeout=0.05)
+
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher.run(time.sleep, 0.5)
+
+        # the sleep is still running in the pool, so its slot is still taken
+        assert hasher.stats()["in_flight"] == 1
+        with pytest.raises(PasswordHasherBusy):
+            hasher.run(time.sleep, 0)
+
+        deadline = time.monotonic() + 5
+        while hasher.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        stats = hasher.stats()
+    finally:
+        hasher.executor.shutdown(wait=True)
+
+    print(f"Password Hasher Stats: {stats}")
+    assert stats["in_flight"] == 0
+    assert stats["rejected"] == 1
+
+
+def test_login_schedules_rehash_for_outdated_cost(client):
+    client, mock_mysql = client
+
+    hashed_password = bcrypt.generate_password_hash(
+        "password123", 4).decode("utf-8")
+    setup_mock_db(mock_mysql, query_result=[
+        {"email": "test@example.com", "password": hashed_password, "role": "admin"}
+    ])
+
+    with patch("api.schedule_rehash") as mock_schedule_rehash:
+        response = client.post(
+            "/auth/login",
+            json={"email": "test@example.com", "password": "password123"},
+        )
+
+    print(f"Login Rehash Response: {response.json}")
+    assert response.status_code == 200
+    mock_schedule_rehash.assert_called_once_with(
+        "test@example.com", hashed_password, "password123")
+    assert "4" in password_hasher.stats()["verify_seconds_by_rounds"]
+
+
+def test_rehash_password_uses_configured_cost(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, rowcount=1)
+    app.config["BCRYPT_LOG_ROUNDS"], rounds = 5, app.config["BCRYPT_LOG_ROUNDS"]
+    try:
+        rehash_password("test@example.com", "old-hash", "password123")
+    finally:
+        app.config["BCRYPT_LOG_ROUNDS"] = rounds
+
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    query, params = mock_cursor.execute.call_args[0]
+    assert query.startswith("UPDATE user SET password")
+    assert params[0].startswith("$2b$05$")
+    assert params[1:] == ("test@example.com", "old-hash")
+
+
+###########################
+### TESTS FOR BULK CRUD ###
+###########################
+def test_add_dogs_bulk(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, rowcount=2)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.lastrowid = 10
+
+    token = generate_token("admin", "admin")
+    response = client.post(
+        "/dogs/bulk",
+        json=[
+            {"name": "Buddy", "gender": 0, "breed": "Labrador"},
+            {"name": "", "gender": 3, "breed": "Beagle"},
+            {"name": "Bella", "gender": 1, "breed": "Beagle"},
+        ],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    print(f"Add Dogs Bulk Response: {response.json}")
+    assert response.status_code == 207
+    assert response.get_json()["inserted_ids"] == [10, None, 11]
+    assert "1" in response.get_json()["errors"]
+    query, params = mock_cursor.execute.call_args[0]
+    assert query == "INSERT INTO dog (name, gender, breed) VALUES (%s, %s, %s), (%s, %s, %s)"
+    assert params == ["Buddy", 0, "Labrador", "Bella", 1, "Beagle"]
+    mock_mysql.connection.commit.assert_called_once()
+
+
+def test_add_health_problems_bulk_large_chunk_is_one_statement(client):
+    client, mock_mysql = client
+
+    # 500 rows of 135-character text are well past mysqlclient's 64 KB
+    # max_stmt_length, where executemany() would split the INSERT
+    rows = [
+        {"health_record_id": 1, "problem": "p" * 135, "date": "2024-01-01", "treatment": "t" * 135}
+        for _ in range(500)
+    ]
+    setup_mock_db(mock_mysql, rowcount=500)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.lastrowid = 1001
+
+    token = generate_token("admin", "admin")
+    response = client.post(
+        "/health_problems/bulk", json=rows,
+        headers={"Authorization": f"Bearer {token}"})
+
+    query, params = mock_cursor.execute.call_args[0]
+    print(f"Add Health Problems Bulk Response: {response.status_code}")
+    assert response.status_code == 201
+    assert mock_cursor.execute.call_count == 1
+    assert len(query) + sum(len(str(param)) for param in params) > 64 * 1024
+    assert query.count("(%s, %s, %s, %s)") == 500
+    assert response.get_json()["inserted_ids"] == list(range(1001, 1501))
+
+
+def test_add_dogs_bulk_short_insert_is_rejected(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, rowcount=1)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.lastrowid = 10
+
+    token = generate_token("admin", "admin")
+    response = client.post(
+        "/dogs/bulk",
+        json=[
+            {"name": "Buddy", "gender": 0, "breed": "Labrador"},
+            {"name": "Bella", "gender": 1, "breed": "Beagle"},
+        ],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    print(f"Add Dogs Bulk Response: {response.json}")
+    assert response.status_code == 500
+    mock_mysql.connection.rollback.assert_called_once()
+    mock_mysql.connection.commit.assert_not_called()
+
+
+def test_add_health_problems_bulk_empty(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    token = generate_token("admin", "admin")
+    response = client.post(
+        "/health_problems/bulk",
+        json=[],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    print(f"Add Health Problems Bulk Empty Response: {response.json}")
+    assert response.status_code == 400
+    assert "invalid bulk request" in response.get_json()["message"]
+
+
+def test_update_health_records_bulk(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, query_result=[{"id": 1}, {"id": 2}], rowcount=2)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    response = client.put(
+        "/health_records/bulk",
+        json=[
+            {"id": 1, "fields": {"vet_id": 3}},
+            {"id": 2, "fields": {"vet_id": 4}},
+            {"id": 9, "fields": {"vet_id": 3}},
+        ],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    print(f"Update Health Records Bulk Response: {response.json}")
+    assert response.status_code == 207
+    assert response.get_json()["missing_ids"] == [9]
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert query.startswith("UPDATE health_record SET vet_id = CASE id")
+    assert params == (1, 3, 2, 4, 1, 2)
+    mock_mysql.connection.commit.assert_called_once()
+
+
+def test_delete_dogs_bulk(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, query_result=[{"id": 1}, {"id": 3}], rowcount=2)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    response = client.delete(
+        "/dogs/bulk",
+        json=[1, 2, 3],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    print(f"Delete Dogs Bulk Response: {response.json}")
+    assert response.status_code == 207
+    assert response.get_json()["missing_ids"] == [2]
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert query == "DELETE FROM dog WHERE id IN (%s, %s)"
+    assert params == (1, 3)
+
+
+def test_dog_schema_loads_slotted_record():
+    schema = DogSchema.cached(partial=True)
+    assert DogSchema.cached(partial=True) is schema
+    assert DogSchema.cached() is not schema
+
+    info = schema.load({"breed": "Beagle", "name": "Bella"})
+
+    print(f"Dog Record: {info.items()}")
+    assert not hasattr(info, "__dict__")
+    assert info.keys() == ["name", "breed"]
+    assert info["breed"] == "Beagle"
+    assert not schema.load({})
+
+
+#######################################
+### TESTS FOR FILTERING AND SORTING ###
+#######################################
+def test_get_dogs_filtered(client):
+    client, mock_mysql = client
+
+    dogs = [{"id": 2, "name": "Bella", "gender": 1, "breed": "Beagle"}]
+    setup_mock_db(mock_mysql, query_result=dogs)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs?breed=Beagle&gender=1", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Get Dogs Filtered Response: {response.json}")
+    assert response.status_code == 200
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert "WHERE breed = %s AND gender = %s ORDER BY id" in query
+    assert params == ("Beagle", 1, 101)
+
+
+def test_get_health_problems_sorted_by_date(client):
+    client, mock_mysql = client
+
+    health_problems = [
+        {"id": 3, "problem": "Fever", "date": "2024-12-05"},
+        {"id": 1, "problem": "Cough", "date": "2024-12-01"},
+    ]
+    setup_mock_db(mock_mysql, query_result=health_problems)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/health_problems?sort=-date&date_gte=2024-01-01&limit=1",
+        headers={"Authorization": f"Bearer {token}"})
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert "WHERE health_problem.date >= %s" in query
+    assert query.endswith(
+        "ORDER BY health_problem.date DESC, health_problem.id DESC LIMIT %s")
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(
+        f"/health_problems?sort=-date&date_gte=2024-01-01&limit=1&after={cursor}",
+        headers={"Authorization": f"Bearer {token}"})
+
+    query, params = mock_cursor.execute.call_args[0]
+    print(f"Sorted Page Query: {query}, Params: {params}")
+    assert "(health_problem.date < %s OR (health_problem.date = %s AND health_problem.id < %s))" in query
+    assert params[1:] == ("2024-12-05", "2024-12-05", 3, 2)
+
+
+def test_get_health_problems_cursor_must_match_sort(client):
+    client, mock_mysql = client
+
+    health_problems = [
+        {"id": 1, "problem": "Cough", "date": "2024-12-01"},
+        {"id": 3, "problem": "Fever", "date": "2024-12-05"},
+    ]
+    setup_mock_db(mock_mysql, query_result=health_problems)
+
+    token = generate_token("admin", "admin")
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/health_problems?sort=date&limit=1", headers=headers)
+    cursor = response.headers["X-Next-Cursor"]
+
+    # the same field in the other direction would seek the wrong way
+    response = client.get(f"/health_problems?sort=-date&limit=1&after={cursor}", headers=headers)
+    assert response.status_code == 400
+
+    # a crafted sorted cursor without the value to seek from
+    crafted = base64.urlsafe_b64encode(b'{"id": 1, "sort": "date"}').decode("ascii")
+    response = client.get(f"/health_problems?sort=date&after={crafted}", headers=headers)
+
+    print(f"Crafted Cursor Response: {response.json}")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "invalid pagination cursor"
+
+
+def test_get_dogs_rejects_unindexed_sort(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs?sort=name", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Get Dogs Unindexed Sort Response: {response.json}")
+    assert response.status_code == 400
+    assert "cannot sort by 'name'" in response.get_json()["error"]
+
+
+def test_get_entities_reject_filesorting_combinations(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    for url in ("/dogs?gender=1",
+                "/health_problems?dog_breed=Beagle&sort=date",
+                "/health_problems?problem=Arthritis&date_gte=2024-01-01",
+                "/litters?sire_id=1&sort=-birthdate&dam_id_gte=2"):
+        response = client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+        print(f"Filesorting Combination Response ({url}): {response.json}")
+        assert response.status_code == 400
+        assert "cannot use an index" in response.get_json()["error"]
+
+    mock_cursor.execute.assert_not_called()
+
+
+def test_get_health_problems_by_problem_sorted_by_date(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, query_result=[])
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/health_problems?problem=Arthritis&sort=-date",
+        headers={"Authorization": f"Bearer {token}"})
+
+    query, params = mock_cursor.execute.call_args[0]
+    print(f"Problem By Date Query: {query}")
+    assert response.status_code == 200
+    assert "WHERE health_problem.problem = %s ORDER BY health_problem.date DESC" in query
+
+
+###################################
+### TESTS FOR SPARSE FIELDSETS ###
+###################################
+def test_get_health_records_sparse_fields(client):
+    client, mock_mysql = client
+
+    health_records = [{"id": 1, "dog": "Buddy"}]
+    setup_mock_db(mock_mysql, query_result=health_records)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/health_records?fields=dog&vet_id=2&breed=Beagle",
+        headers={"Authorization": f"Bearer {token}"})
+
+    query, params = mock_cursor.execute.call_args[0]
+    print(f"Sparse Fields Query: {query}")
+    assert response.status_code == 200
+    assert query.startswith(
+        "SELECT dog.name AS dog, health_record.id FROM health_record "
+        "JOIN dog ON health_record.dog_id = dog.id "
+        "WHERE health_record.vet_id = %s AND dog.breed = %s")
+    assert "JOIN vet" not in query
+
+
+def test_get_dog_unknown_field(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs/1?fields=name,owner", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Unknown Field Response: {response.json}")
+    assert response.status_code == 400
+    assert "unknown field 'owner'" in response.get_json()["error"]
+
+
+#############################
+### TESTS FOR DOG PROFILE ###
+#############################
+def test_get_dog_profile(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchall.side_effect = [
+        [{"id": 5, "name": "Buddy", "gender": 0, "breed": "Labrador",
+          "litter_id": 2, "birthdate": date(2024, 1, 1), "birthplace": "Kennel A",
+          "sire_id": 1, "sire_name": "Rex", "sire_breed": "Labrador",
+          "dam_id": 3, "dam_name": "Bella", "dam_breed": "Labrador"}],
+        [{"id": 7, "vet_id": 1, "vet_name": "John Doe"},
+         {"id": 8, "vet_id": 2, "vet_name": "Jane Smith"}],
+        [{"id": 1, "health_record_id": 8, "problem": "Fever",
+          "date": date(2024, 12, 1), "treatment": "Antibiotics"},
+         {"id": 2, "health_record_id": 8, "problem": "Cough",
+          "date": date(2024, 12, 5), "treatment": None}],
+    ]
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs/5/profile", headers={"Authorization": f"Bearer {token}"})
+
+    profile = response.get_json()
+    print(f"Dog Profile Response: {profile}")
+    assert response.status_code == 200
+    assert profile["litter"]["sire"]["name"] == "Rex"
+    assert profile["litter"]["dam"]["id"] == 3
+    assert [len(record["problems"]) for record in profile["health_records"]] == [0, 2]
+    assert mock_cursor.execute.call_count == 3
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert "WHERE health_record_id IN (%s, %s)" in query
+    assert params == (7, 8)
+
+
+def test_get_dog_profile_not_found(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, query_result=[])
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs/99/profile", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Dog Profile Not Found Response: {response.json}")
+    assert response.status_code == 404
+
+
+##########################
+### TESTS FOR PEDIGREE ###
+##########################
+def test_get_dog_pedigree_stops_at_cycle(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchall.side_effect = [
+        [{"id": 1, "name": "Buddy", "gender": 0, "breed": "Pug", "sire_id": 2, "dam_id": 3}],
+        [{"id": 2, "name": "Rex", "gender": 0, "breed": "Pug", "sire_id": 1, "dam_id": 4},
+         {"id": 3, "name": "Bella", "gender": 1, "breed": "Pug", "sire_id": None, "dam_id": None}],
+        [{"id": 4, "name": "Daisy", "gender": 1, "breed": "Pug", "sire_id": None, "dam_id": None}],
+    ]
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs/1/pedigree?depth=4", headers={"Authorization": f"Bearer {token}"})
+
+    tree = response.get_json()
+    print(f"Dog Pedigree Response: {tree}")
+    assert response.status_code == 200
+    assert tree["sire"]["sire"] == {"id": 1, "name": "Buddy", "gender": 0, "breed": "Pug", "cycle": True}
+    assert tree["sire"]["dam"]["name"] == "Daisy"
+    assert tree["dam"]["sire"] is None
+    assert mock_cursor.execute.call_count == 3
+
+
+def test_get_dog_pedigree_depth_cap(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        f"/dogs/1/pedigree?depth={app.config['PEDIGREE_DEPTH_MAX'] + 1}",
+        headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Dog Pedigree Depth Response: {response.json}")
+    assert response.status_code == 400
+    assert "depth must be between" in response.get_json()["error"]
+
+
+#############################
+### TESTS FOR DESCENDANTS ###
+#############################
+def test_get_dog_descendants_tree(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    litter = {"litter_id": 10, "sire_id": 1, "dam_id": 5, "birthdate": date(2023, 1, 1)}
+    mock_cursor.fetchall.side_effect = [
+        [{"id": 1, "name": "Rex", "gender": 0, "breed": "Pug"}],
+        [{"id": 2, "name": "Max", "gender": 0, "breed": "Pug", **litter},
+         {"id": 3, "name": "Bella", "gender": 1, "breed": "Pug", **litter}],
+        [{"id": 4, "name": "Buddy", "gender": 0, "breed": "Pug", "litter_id": 11,
+          "sire_id": 2, "dam_id": 3, "birthdate": date(2024, 1, 1)}],
+        [],
+    ]
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs/1/descendants?depth=3", headers={"Authorization": f"Bearer {token}"})
+
+    body = response.get_json()
+    print(f"Dog Descendants Response: {body}")
+    assert response.status_code == 200
+    assert body["count"] == 3
+    assert body["truncated"] is False
+
+    puppies = body["dog"]["litters"][0]["offspring"]
+    assert [puppy["id"] for puppy in puppies] == [2, 3]
+    assert puppies[0]["litters"][0]["offspring"][0]["name"] == "Buddy"
+    assert puppies[1]["litters"][0]["offspring"][0] == {
+        "id": 4, "name": "Buddy", "gender": 0, "breed": "Pug", "repeated": True}
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert "WHERE litter.sire_id IN (%s) OR litter.dam_id IN (%s)" in " ".join(query.split())
+    assert params == (4, 4, app.config["DESCENDANTS_MAX_ROWS"] + 1)
+
+    # sire x own daughter: Cora is reached through Rex directly and again,
+    # one generation further, through Ada; she is expanded at the shallower
+    # copy, so her puppy Dot still fits within depth=2
+    mock_cursor.fetchall.side_effect = [
+        [{"id": 20, "name": "Rex", "gender": 0, "breed": "Pug"}],
+        [{"id": 21, "name": "Ada", "gender": 1, "breed": "Pug", "litter_id": 30,
+          "sire_id": 20, "dam_id": 25, "birthdate": date(2020, 1, 1)},
+         {"id": 22, "name": "Cora", "gender": 1, "breed": "Pug", "litter_id": 31,
+          "sire_id": 20, "dam_id": 21, "birthdate": date(2022, 1, 1)}],
+        [{"id": 22, "name": "Cora", "gender": 1, "breed": "Pug", "litter_id": 31,
+          "sire_id": 20, "dam_id": 21, "birthdate": date(2022, 1, 1)},
+         {"id": 23, "name": "Dot", "gender": 1, "breed": "Pug", "litter_id": 32,
+          "sire_id": 26, "dam_id": 22, "birthdate": date(2024, 1, 1)}],
+    ]
+
+    response = client.get(
+        "/dogs/20/descendants?depth=2", headers={"Authorization": f"Bearer {token}"})
+
+    body = response.get_json()
+    print(f"Dog Descendants Response: {body}")
+    assert body["count"] == 3
+
+    ada, cora = (litter["offspring"][0] for litter in body["dog"]["litters"])
+    assert ada["litters"][0]["offspring"][0] == {
+        "id": 22, "name": "Cora", "gender": 1, "breed": "Pug", "repeated": True}
+    assert cora["litters"][0]["offspring"][0]["name"] == "Dot"
+
+
+def test_get_dog_descendants_stream_truncated(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    litter = {"litter_id": 10, "sire_id": 1, "dam_id": 5, "birthdate": "2023-01-01"}
+    mock_cursor.fetchall.side_effect = [
+        [{"id": 1, "name": "Rex", "gender": 0, "breed": "Pug"}],
+        [{"id": 2, "name": "Max", "gender": 0, "breed": "Pug", **litter},
+         {"id": 3, "name": "Bella", "gender": 1, "breed": "Pug", **litter}],
+    ]
+
+    app.config["DESCENDANTS_MAX_ROWS"], limit = 1, app.config["DESCENDANTS_MAX_ROWS"]
+    try:
+        token = generate_token("admin", "admin")
+        response = client.get(
+            "/dogs/1/descendants?stream=1", headers={"Authorization": f"Bearer {token}"})
+        lines = response.get_data(as_text=True).splitlines()
+    finally:
+        app.config["DESCENDANTS_MAX_ROWS"] = limit
+
+    print(f"Dog Descendants Stream: {lines}")
+    assert response.mimetype == "application/x-ndjson"
+    assert len(lines) == 2
+    assert '"generation":1' in lines[0]
+    assert lines[1] == '{"truncated":true}'
+
+
+##########################################
+### TESTS FOR INBREEDING COEFFICIENTS ###
+##########################################
+def test_get_coi_full_siblings(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchall.side_effect = [
+        [{"id": 3, "name": "Max", "gender": 0, "breed": "Pug", "sire_id": 1, "dam_id": 2},
+         {"id": 4, "name": "Bella", "gender": 1, "breed": "Pug", "sire_id": 1, "dam_id": 2}],
+        [{"id": 1, "name": "Rex", "gender": 0, "breed": "Pug", "sire_id": None, "dam_id": None},
+         {"id": 2, "name": "Daisy", "gender": 1, "breed": "Pug", "sire_id": None, "dam_id": None}],
+    ]
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/coi?sire_id=3&dam_id=4&generations=3",
+        headers={"Authorization": f"Bearer {token}"})
+
+    print(f"COI Response: {response.json}")
+    assert response.status_code == 200
+    assert response.get_json()["coi"] == 0.25
+    assert response.get_json()["ancestors"] == 4
+
+
+def test_get_coi_requires_parents(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/coi?sire_id=3", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"COI Missing Dam Response: {response.json}")
+    assert response.status_code == 400
+    assert "dam_id is required" in response.get_json()["error"]
+
+
+################################
+### TESTS FOR PEDIGREE INDEX ###
+################################
+def version_bumps(mock_cursor):
+    return [
+        call for call in mock_cursor.execute.call_args_list
+        if call[0][0].startswith("UPDATE pedigree_version")
+    ]
+
+
+def test_pedigree_index_applies_writes(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, rowcount=1)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchall.side_effect = [
+        [{"version": 7}],
+        [(1, None), (2, None), (3, 1), (4, 1)],
+        [(1, 1, 2)],
+        [{"version": 8}],
+    ]
+
+    pedigree_index.clear()
+    app.config["PEDIGREE_INDEX_ENABLED"] = True
+    try:
+        token = generate_token("admin", "admin")
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = client.get("/coi?sire_id=3&dam_id=4", headers=headers)
+        assert response.get_json()["coi"] == 0.25
+
+        # the version bump and the insert both report through lastrowid
+        mock_cursor.lastrowid = 8
+        response = client.post(
+            "/dogs", json={"name": "Max", "gender": 0, "breed": "Pug", "litter_id": 1},
+            headers=headers)
+        assert response.status_code == 201
+
+        response = client.get("/coi?sire_id=8&dam_id=4", headers=headers)
+        coi = response.get_json()["coi"]
+
+        # a rename leaves the parent links alone: no bump, index untouched
+        bumps = len(version_bumps(mock_cursor))
+        response = client.put("/dogs/8", json={"name": "Maxi"}, headers=headers)
+        assert response.status_code == 200
+        assert len(version_bumps(mock_cursor)) == bumps
+        assert pedigree_index.stats()["version"] == 8
+
+        mock_cursor.lastrowid = 20
+        client.delete("/dogs/8", headers=headers)
+        stats = pedigree_index.stats()
+    finally:
+        app.config["PEDIGREE_INDEX_ENABLED"] = False
+        pedigree_index.clear()
+
+    print(f"Pedigree Index Stats: {stats}")
+    assert coi == 0.25
+    # the cache miss after the insert checks the version again
+    assert mock_cursor.fetchall.call_count == 4
+    assert len(version_bumps(mock_cursor)) == 2
+    assert stats["version"] == 8
+    assert stats["dogs"] == 5
+    assert stats["rebuilds"] == 1
+    assert stats["stale"] is True
+
+
+def test_pedigree_index_snapshot_ignores_later_writes(client):
+    pedigree_index.clear()
+    try:
+        for kind, entity, id, info in (("insert", "litter", 1, {"sire_id": 1, "dam_id": 2}),
+                                       ("insert", "dog", 3, {"litter_id": 1})):
+            pedigree_index.apply(entity, kind, id, info)
+
+        snapshot = pedigree_index.snapshot()
+        pedigree_index.apply("dog", "update", 3, {"litter_id": None})
+        parents = snapshot.parents(3), pedigree_index.parents(3)
+    finally:
+        pedigree_index.clear()
+
+    assert parents == ((1, 2), (0, 0))
+
+def test_pedigree_index_rereads_version_on_cache_miss(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    mock_cursor.fetchall.side_effect = [
+        [{"version": 7}],
+        [(1, None), (2, None), (3, 1), (4, 1)],
+        [(1, 1, 2)],
+        # another worker linked dog 4 to a litter of its own
+        [{"version": 9}],
+        [{"version": 9}],
+        [(1, None), (2, None), (3, 1), (4, 2)],
+        [(1, 1, 2), (2, 1, 2)],
+    ]
+
+    pedigree_index.clear()
+    app.config["PEDIGREE_INDEX_ENABLED"] = True
+    app.config["PEDIGREE_INDEX_CHECK_SECONDS"], check_seconds = (
+        3600, app.config["PEDIGREE_INDEX_CHECK_SECONDS"])
+    try:
+        token = generate_token("admin", "admin")
+        headers = {"Authorization": f"Bearer {token}"}
+
+        client.get("/coi?sire_id=3&dam_id=4", headers=headers)
+        response_cache.invalidate("litter")
+        response = client.get("/coi?sire_id=3&dam_id=4", headers=headers)
+        stats = pedigree_index.stats()
+    finally:
+        app.config["PEDIGREE_INDEX_CHECK_SECONDS"] = check_seconds
+        app.config["PEDIGREE_INDEX_ENABLED"] = False
+        pedigree_index.clear()
+
+    print(f"Pedigree Index Stats: {stats}")
+    assert response.headers["X-Cache"] == "MISS"
+    assert stats["version"] == 9
+    assert stats["rebuilds"] == 2
+
+
+###################################
+### TESTS FOR MATE SUGGESTIONS ###
+###################################
+def test_get_mate_suggestions_ranks_by_coi_and_health(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+    female = {"gender": 0, "breed": "Pug"}
+    mock_cursor.fetchall.side_effect = [
+        [{"id": 3, "name": "Max", "gender": 1, "breed": "Pug"}],
+        [{"id": 4, "name": "Bella", **female},
+         {"id": 5, "name": "Daisy", **female},
+         {"id": 6, "name": "Luna", **female}],
+        [{"id": 3, "name": "Max", "gender": 1, "breed": "Pug", "sire_id": 1, "dam_id": 2},
+         {"id": 4, "name": "Bella", **female, "sire_id": 1, "dam_id": 2},
+         {"id": 5, "name": "Daisy", **female, "sire_id": None, "dam_id": None},
+         {"id": 6, "name": "Luna", **female, "sire_id": None, "dam_id": None}],
+        [{"id": 1, "name": "Rex", "gender": 1, "breed": "Pug", "sire_id": None, "dam_id": None},
+         {"id": 2, "name": "Rose", **female, "sire_id": None, "dam_id": None}],
+        [{"dog_id": 1, "problem": "Hip dysplasia"},
+         {"dog_id": 5, "problem": "Hip dysplasia"}],
+    ]
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/dogs/3/mate_suggestions?limit=2", headers={"Authorization": f"Bearer {token}"})
+
+    body = response.get_json()
+    print(f"Mate Suggestions Response: {body}")
+    assert response.status_code == 200
+    assert body["candidates"] == 3
+    assert [suggestion["id"] for suggestion in body["suggestions"]] == [6, 5]
+    assert body["suggestions"][1]["problems"] == ["Hip dysplasia"]
+    assert body["suggestions"][1]["coi"] == 0.0
+
+    query, params = mock_cursor.execute.call_args_list[1][0]
+    assert "WHERE breed = %s AND gender = %s" in query
+    assert params == ("Pug", 0, 3)
+
+
+def test_suggest_mates_cuts_off_each_pairing_like_coi(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    # Max (10) out of Rose (12); Rose and her sister Ivy (15) share parents.
+    # Rose being a candidate too must not stretch Max's ancestry for Ivy
+    graph = PedigreeGraph()
+    for id, sire_id, dam_id in ((10, 11, 12), (11, 0, 0), (12, 13, 14),
+                                (13, 0, 0), (14, 0, 0), (15, 13, 14)):
+        graph.set_parents(id, sire_id, dam_id)
+
+    candidates = [{"id": 12, "name": "Rose"}, {"id": 15, "name": "Ivy"}]
+    suggestions = suggest_mates(graph, {"id": 10}, candidates, 2, 10)
+
+    print(f"Mate Suggestions: {suggestions}")
+    assert [suggestion["id"] for suggestion in suggestions] == [15, 12]
+    assert suggestions[0]["coi"] == coefficient_of_inbreeding(graph, 10, 15, 2)[0] == 0.0
+    assert suggestions[1]["coi"] == coefficient_of_inbreeding(graph, 10, 12, 2)[0] == 0.25
+
+
+def test_coi_cuts_off_each_parent_on_its_own(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    # Bob (33) is Max's (30) great-grandsire but Lady's (34) sire. Bob's
+    # own sire Duke (37) is also Lady's grandsire, yet sits beyond Max's
+    # three generations, so only the path through Bob counts: 1/16
+    graph = PedigreeGraph()
+    for id, sire_id, dam_id in ((30, 31, 32), (31, 0, 0), (32, 33, 0), (33, 37, 0),
+                                (34, 33, 36), (36, 37, 0), (37, 0, 0)):
+        graph.set_parents(id, sire_id, dam_id)
+
+    coi, ancestors = coefficient_of_inbreeding(graph, 30, 34, 3)
+    candidates = [{"id": 33, "name": "Bob"}, {"id": 34, "name": "Lady"}]
+    suggestions = suggest_mates(graph, {"id": 30}, candidates, 3, 10)
+
+    print(f"Per Parent COI: {coi}, Mate Suggestions: {suggestions}")
+    assert coi == 0.0625
+    assert ancestors == 7
+    assert {suggestion["id"]: suggestion["coi"] for suggestion in suggestions} == {
+        33: coefficient_of_inbreeding(graph, 30, 33, 3)[0], 34: coi}
+
+
+################################
+### TESTS FOR RESPONSE CACHE ###
+################################
+def test_get_litters_cached_until_dog_changes(client):
+    client, mock_mysql = client
+
+    litters = [{"id": 1, "sire_id": 1, "dam_id": 2,
+                "birthdate": "2024-12-01", "birthplace": "Kennel A"}]
+    setup_mock_db(mock_mysql, query_result=litters, rowcount=1)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = client.get("/litters", headers=headers)
+    second = client.get("/litters", headers=headers)
+
+    print(f"Cached Litters Response: {second.json}")
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == first.get_json()
+    assert mock_cursor.fetchall.call_count == 1
+
+    response = client.put("/dogs/1", json={"name": "Rex"}, headers=headers)
+    assert response.status_code == 200
+
+    third = client.get("/litters", headers=headers)
+    assert third.headers["X-Cache"] == "MISS"
+    assert mock_cursor.fetchall.call_count == 2
+
+
+def test_response_cache_is_keyed_by_role(client):
+    client, mock_mysql = client
+
+    dogs = [{"id": 1, "name": "Buddy", "gender": 0, "breed": "Labrador"}]
+    setup_mock_db(mock_mysql, query_result=dogs)
+
+    for role in ("admin", "buyer"):
+        token = generate_token(role, role)
+        response = client.get(
+            "/dogs", headers={"Authorization": f"Bearer {token}"})
+        assert response.headers["X-Cache"] == "MISS"
+
+
+##################################
+### TESTS FOR CONDITIONAL GETS ###
+##################################
+def test_get_health_problems_not_modified(client):
+    client, mock_mysql = client
+
+    health_problems = [
+        {"id": 1, "health_record_id": 1, "problem": "Fever",
+            "date": "2024-12-01", "treatment": "Antibiotics"},
+    ]
+    setup_mock_db(mock_mysql, query_result=health_problems, rowcount=1)
+
+    token = generate_token("admin", "admin")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/health_problems", headers=headers)
+    etag = response.headers["ETag"]
+
+    for caching in (True, False):
+        app.config["RESPONSE_CACHE_ENABLED"] = caching
+        try:
+            response = client.get(
+                "/health_problems", headers={**headers, "If-None-Match": etag})
+        finally:
+            app.config["RESPONSE_CACHE_ENABLED"] = True
+
+        print(f"Conditional Get Status: {response.status_code}")
+        assert response.status_code == 304
+        assert response.get_data() == b""
+
+
+def test_get_health_problems_if_modified_since(client):
+    client, mock_mysql = client
+
+    health_problems = [
+        {"id": 1, "health_record_id": 1, "problem": "Fever",
+            "date": "2024-12-01", "treatment": "Antibiotics"},
+    ]
+    setup_mock_db(mock_mysql, query_result=health_problems, rowcount=1)
+
+    token = generate_token("admin", "admin")
+    headers = {"Authorization": f"Bearer {token}"}
+    later = "Fri, 01 Jan 2100 00:00:00 GMT"
+
+    # a per-process backend never saw the other workers' writes
+    response = client.get("/health_problems", headers={**headers, "If-Modified-Since": later})
+    assert "Last-Modified" not in response.headers
+    assert response.status_code == 200
+
+    backend = response_cache.backend
+    backend.clear()
+    backend.started = time.time() - 10
+    with patch.object(backend, "shared", True):
+        response = client.get("/health_problems", headers=headers)
+        last_modified = response.headers["Last-Modified"]
+
+        response = client.get(
+            "/health_problems", headers={**headers, "If-Modified-Since": last_modified})
+        assert response.status_code == 304
+
+        # a write in the same second as the GET: the date is withheld until
+        # the second is over instead of matching the old one
+        client.put("/health_problems/1", json={"problem": "Cough"}, headers=headers)
+        response = client.get(
+            "/health_problems", headers={**headers, "If-Modified-Since": last_modified})
+
+    print(f"If-Modified-Since Status: {response.status_code}")
+    assert response.status_code == 200
+
+
+#################################
+### TESTS FOR STATEMENT CACHE ###
+#################################
+def test_update_dog_reuses_cached_statement(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql, rowcount=1)
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    token = generate_token("admin", "admin")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.put("/dogs/1", json={"breed": "Pug", "name": "Rex"}, headers=headers)
+    first_query, first_params = mock_cursor.execute.call_args[0]
+    hits = statement_cache.stats()["hits"]
+
+    response = client.put("/dogs/2", json={"name": "Max", "breed": "Beagle"}, headers=headers)
+    query, params = mock_cursor.execute.call_args[0]
+
+    print(f"Cached Update Query: {query}, Params: {params}")
+    assert response.status_code == 200
+    assert query is first_query
+    assert query == "UPDATE dog SET name = %s, breed = %s WHERE id = %s"
+    assert params == ("Max", "Beagle", 2)
+    assert statement_cache.stats()["hits"] == hits + 1
+
+
+def test_statement_cache_is_bounded():
+    cache = StatementCache(size=2)
+
+    cache.get("insert", "dog", ("name", "breed"))
+    cache.get("insert", "dog", ("breed", "name"))
+    cache.get("insert", "vet", ("firstname",))
+    cache.get("update", "vet", ("firstname",))
+
+    stats = cache.stats()
+    print(f"Statement Cache Stats: {stats}")
+    assert stats["statements"] == 2
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["evictions"] == 1
+
+
+###############################
+### TESTS FOR JSON PROVIDER ###
+###############################
+def test_get_litters_serializes_dates_natively(client):
+    client, mock_mysql = client
+
+    litters = [{"id": 1, "sire_id": 1, "dam_id": 2,
+                "birthdate": date(2024, 12, 1), "birthplace": "Kennel A"}]
+    setup_mock_db(mock_mysql, query_result=litters)
+
+    token = generate_token("admin", "admin")
+    response = client.get(
+        "/litters", headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Get Litters Response: {response.json}")
+    assert isinstance(app.json, OrjsonProvider)
+    assert response.get_json()[0]["birthdate"] == "2024-12-01"
+
+
+def test_orjson_provider_matches_stdlib_layout():
+    rows = [{"id": 1, "name": "Bella", "breed": "Beagle", "gender": 1}]
+
+    fast = OrjsonProvider(app).dumps(rows)
+    stdlib = DefaultJSONProvider(app).dumps(rows, separators=(",", ":"))
+
+    assert fast == stdlib
+
+
+##################################
+### TESTS FOR HEALTH ANALYTICS ###
+##################################
+def test_update_health_record_moves_summary_counts(client):
+    client, mock_mysql = client
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    setup_mock_db(mock_mysql, rowcount=1)
+
+    app.config["HEALTH_SUMMARY_ENABLED"] = True
+    try:
+        token = generate_token("admin", "admin")
+        response = client.put(
+            "/health_records/3", json={"vet_id": 2},
+            headers={"Authorization": f"Bearer {token}"})
+    finally:
+        app.config["HEALTH_SUMMARY_ENABLED"] = False
+
+    queries = [call[0] for call in mock_cursor.execute.call_args_list]
+    print(f"Health Record Update Queries: {queries}")
+    assert response.status_code == 200
+    # only the vet summary depends on vet_id: taken out, updated, put back
+    assert [query.split()[:3] for query, _ in queries] == [
+        ["INSERT", "INTO", "health_problem_by_vet"],
+        ["UPDATE", "health_record", "SET"],
+        ["INSERT", "INTO", "health_problem_by_vet"],
+    ]
+    assert "hp.health_record_id IN (%s)" in queries[0][0]
+    assert queries[0][1] == (-1, 3)
+    assert queries[2][1] == (1, 3)
+
+
+def test_get_health_analytics_by_breed(client):
+    client, mock_mysql = client
+    mock_cursor = mock_mysql.connection.cursor.return_value
+
+    rows = [{"breed": "Beagle", "month": date(2024, 1, 1), "problems": 4}]
+    setup_mock_db(mock_mysql, query_result=rows)
+
+    app.config["HEALTH_SUMMARY_ENABLED"] = True
+    try:
+        token = generate_token("vet", "vet")
+        response = client.get(
+            "/analytics/health/breeds?group_by=breed,month&problem=Otitis&month_gte=2024-01-01",
+            headers={"Authorization": f"Bearer {token}"})
+    finally:
+        app.config["HEALTH_SUMMARY_ENABLED"] = False
+
+    query, params = mock_cursor.execute.call_args[0]
+    print(f"Health Analytics Query: {query}, Params: {params}")
+    assert response.status_code == 200
+    assert response.get_json() == [{"breed": "Beagle", "month": "2024-01-01", "problems": 4}]
+    assert "FROM health_problem_by_breed" in query
+    assert "GROUP BY breed, month" in query
+    assert params == ("Otitis", date(2024, 1, 1))
+
+
+def test_get_health_analytics_invalid_group_by(client):
+    client, mock_mysql = client
+
+    setup_mock_db(mock_mysql)
+
+    token = generate_token("vet", "vet")
+    response = client.get(
+        "/analytics/health/vets?group_by=breed",
+        headers={"Authorization": f"Bearer {token}"})
+
+    print(f"Health Analytics Response: {response.json}")
+    assert response.status_code == 400